@@ -4,7 +4,7 @@ from flask import Flask
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from app.services.rabbitmq_rpc_server import start_rpc_server  # 导入RPC消费者启动函数
-from config import Config
+from app.config import Config
 from app.utils.error_handler import register_error_handlers  # 引入异常处理函数
 from flask_marshmallow import Marshmallow  # 引入 Marshmallow
 from app.logger import get_logger
@@ -32,7 +32,9 @@ def start_rabbitmq_rpc_consumer():
     logger.info("RabbitMQ RPC 消费者线程已启动.")
     # print("RabbitMQ RPC 消费者线程已启动.")
 
-start_rabbitmq_rpc_consumer()
+# 只由 RPC_CONSUMER_EMBEDDED 决定是否启动；独立消费者、批量打标命令行等入口运行时设置环境变量 RPC_CONSUMER_EMBEDDED=0
+if Config.RPC_CONSUMER_EMBEDDED:
+    start_rabbitmq_rpc_consumer()
 # 注册全局异常捕获器
 register_error_handlers(app)
 
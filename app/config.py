@@ -18,3 +18,115 @@ class Config:
     #获取文件接口
     EXTERNAL_FILE_LIST_URL = ""
 
+    # 打标规则配置
+    MARKING_RULE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config_table', 'MarkingRule.yaml')
+    RULE_WATCH_INTERVAL = 10  # 规则文件变更检查间隔（秒），0 表示不监听
+    RULE_RELOAD_EXCHANGE = 'file_mark_rule_reload'  # 规则重新加载广播使用的 fanout 交换机
+    # 编译后规则的缓存目录，默认为当前用户的缓存目录（权限 0700），不写入当前工作目录；设置为空表示不使用缓存
+    RULE_CACHE_DIR = os.environ.get('RULE_CACHE_DIR', os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'file_mark', 'rule_cache'))
+
+    # 打标结果缓存配置
+    MARK_CACHE_SIZE = 100000  # 缓存的最大路径数，0 表示不缓存
+    MARK_CACHE_TTL = 3600  # 缓存有效期（秒），0 表示不过期
+    MARK_BATCH_DEDUP = True  # 批量打标时按目录前缀和文件名去重扫描
+
+    # 多进程打标配置
+    MARK_POOL_WORKERS = 0  # 打标进程数，0 表示 CPU 核数平分给各消费者进程（不超过 MARK_POOL_MAX_WORKERS）
+    MARK_POOL_MAX_WORKERS = 4  # 未指定打标进程数时每个消费者进程的进程数上限
+    MARK_POOL_START_METHOD = 'forkserver'  # 打标子进程启动方式：forkserver 或 spawn，不使用 fork
+    MARK_PARALLEL_TIMEOUT = 120  # 一批文件多进程打标的超时时间（秒），超时后回退到当前进程打标
+    MARK_PARALLEL_THRESHOLD = 5000  # 文件数达到该值才使用多进程打标
+    MARK_PARALLEL_CHUNK_SIZE = 2000  # 每个分片的文件数
+
+    # RPC 消费者配置
+    RPC_CONSUMER_CONNECTIONS = 1  # 每个进程的消费者连接数，每个连接一个通道
+    RPC_WORKER_THREADS = 4  # 每个消费者处理消息的工作线程数
+    RPC_PREFETCH_COUNT = 0  # 每个通道未确认消息上限，0 表示与工作线程数相同
+    RPC_RECONNECT_DELAY = 5  # 连接断开后重连等待时间（秒）
+    RPC_CONSUMER_EMBEDDED = os.environ.get('RPC_CONSUMER_EMBEDDED', '1') != '0'  # Flask 进程内是否启动消费者线程
+    RPC_CONSUMER_PROCESSES = 1  # 独立消费者入口默认的进程数
+    RPC_CLIENT_POOL_SIZE = 4  # Web 端 RPC 客户端连接池大小
+    RPC_HEARTBEAT = 30  # RPC 客户端连接的心跳间隔（秒），用于发现已失效的连接
+    RPC_HEALTH_CHECK_INTERVAL = 30  # 连接空闲超过该时间（秒）后，交给请求前先向 broker 确认连接可用
+    RPC_HEALTH_CHECK_TIMEOUT = 2  # 连接可用性检查的超时时间（秒）
+
+    # 异步打标任务配置
+    MARK_JOB_MAX_JOBS = 1000  # 最多保留的任务数
+    MARK_JOB_TTL = 3600  # 任务及结果保留时间（秒）
+    MARK_JOB_TIMEOUT = 600  # 任务未完成的最长等待时间（秒）
+    MARK_JOB_MAX_PAGE_SIZE = 999  # 分页获取结果时每页最大数量
+    MARK_JOB_SHARED_STORE = True  # 任务状态和结果写入数据库，多个 Web 工作进程都能查询；关闭时只能单进程部署
+    MARK_JOB_RESULT_BATCH_SIZE = 1000  # 任务结果批量写入数据库的每批行数
+    MARK_JOB_PROGRESS_INTERVAL = 2  # 运行中任务的进度写入数据库的最短间隔（秒）
+    MARK_JOB_PURGE_INTERVAL = 60  # 清理数据库中过期任务的间隔（秒）
+    RPC_TIMEOUT = 10  # 同步打标请求的超时时间（秒）
+
+    # 打标请求分片配置
+    MARK_FANOUT_CHUNK_SIZE = 2000  # 每条 RPC 消息最多包含的文件数，超过则拆分为多个分片
+    MARK_FANOUT_FAILURE_POLICY = "fail"  # 分片失败策略：fail 整批失败，partial 失败分片返回空标签
+    MARK_FANOUT_RETRIES = 1  # 单个分片失败后的重试次数
+    MARK_RESEND_THREADS = 2  # 执行分片重试和旧格式重发的线程数
+
+    # 打标 RPC 消息格式配置
+    RPC_WIRE_FORMAT = "auto"  # json 旧格式；compact 紧凑格式；auto 确认消费者支持后使用紧凑格式
+    RPC_COMPRESS_THRESHOLD = 64 * 1024  # 消息体超过该字节数时压缩，0 表示不压缩
+    RPC_COMPRESS_LEVEL = 1  # zlib 压缩级别
+
+    # 请求校验配置
+    VALIDATION_MODE = "schema"  # schema: marshmallow 完整校验；fast: 快速校验，不符合时回退完整校验
+
+    # 流式打标配置
+    MARK_STREAM_MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 流式打标接口的请求体大小上限 1 GB
+    MARK_STREAM_BATCH_SIZE = 2000  # 流式打标每批发送的文件数
+    MARK_STREAM_MAX_INFLIGHT = 4  # 同时在途的打标批次数
+
+    # 打标结果持久化配置
+    MARK_RESULT_STORE = True  # 按 (neid, rev, 规则摘要) 保存打标结果，未变化的文件不再重新打标
+    MARK_RESULT_STORE_BATCH_SIZE = 500  # 批量查询和写入的每批行数
+    MARK_RESULT_STORE_RETRY_DELAY = 60  # 数据库不可用时跳过持久化的时间（秒）
+
+    # 处理记录批量写入配置
+    FILE_RECORD_ON_PROCESS = False  # 处理本地文件夹后是否由后台线程写入处理记录（file_records）
+    FILE_RECORD_BATCH_SIZE = 1000  # 每次多行插入的记录数
+    FILE_RECORD_QUEUE_SIZE = 100000  # 后台写入队列的最大记录数
+    FILE_RECORD_FLUSH_INTERVAL = 1.0  # 队列未满一批时的最长等待时间（秒）
+    FILE_RECORD_SUBMIT_TIMEOUT = 5  # 队列已满时提交的最长等待时间（秒）
+
+    # 外部文件列表接口配置
+    EXTERNAL_REQUEST_TIMEOUT = 10  # 单次请求超时时间（秒）
+    EXTERNAL_HTTP_POOL_SIZE = 16  # 共享 Session 每个主机的连接池大小
+    EXTERNAL_PAGE_SIZE = 999  # 分页读取时每页的文件数（上限 999）
+    EXTERNAL_CRAWL_WORKERS = 4  # 分页读取时的并发请求数
+
+    # 目录树遍历打标配置
+    WALK_MAX_DEPTH = 32  # 最大遍历深度，根目录为 0
+    WALK_MAX_FILES = 1000000  # 单个任务最多打标的文件数，0 表示不限
+    WALK_WORKERS = 4  # 并发遍历的目录数
+    WALK_PAGE_WORKERS = 2  # 单个目录分页读取的并发数
+    WALK_QUEUE_SIZE = 10000  # 已发现但尚未送去打标的文件数上限
+    WALK_MARK_BATCH_SIZE = 2000  # 每批送去打标的文件数
+    WALK_MARK_MAX_INFLIGHT = 4  # 同时在途的打标批次数
+    WALK_JOB_TIMEOUT = 6 * 3600  # 目录打标任务超时时间（秒）
+
+    # 外部接口 token 配置（/v2/oauth/token），token 地址为空时请求不携带 token
+    EXTERNAL_OAUTH_TOKEN_URL = ""
+    EXTERNAL_OAUTH_CLIENT_ID = ""
+    EXTERNAL_OAUTH_CLIENT_SECRET = ""
+    EXTERNAL_OAUTH_SLUG = ""  # 默认的用户登录名
+    EXTERNAL_TOKEN_AUTH_SCHEME = "Basic"  # 请求外部接口时 Authorization 头的认证方式
+    EXTERNAL_TOKEN_REFRESH_MARGIN = 60  # token 过期前多少秒开始刷新
+    EXTERNAL_TOKEN_DEFAULT_TTL = 3600  # 响应中没有 expires_in 时的 token 有效期（秒）
+
+    # 增量同步配置
+    SYNC_SNAPSHOT_BATCH_SIZE = 1000  # 目录快照批量写入和删除的每批行数
+
+    # 批量打标命令行配置（python -m app.services.batch_pipeline）
+    PIPELINE_BATCH_SIZE = 20000  # 每批文件数，达到 MARK_PARALLEL_THRESHOLD 时使用进程池打标
+    PIPELINE_QUEUE_SIZE = 4  # 阶段之间缓冲的批次数
+    PIPELINE_REPORT_INTERVAL = 10  # 吞吐统计输出间隔（秒）
+    PIPELINE_SAVE_RETRIES = 3  # 打标结果写入失败后的重试次数，仍失败则停止并保留断点
+    PIPELINE_SAVE_RETRY_DELAY = 10  # 写入重试间隔（秒）
+
+    # 本地目录遍历配置
+    LOCAL_WALK_WORKERS = 4  # 递归遍历本地目录时并发扫描的目录数
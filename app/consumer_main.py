@@ -0,0 +1,38 @@
+"""
+独立运行的文件打标 RPC 消费者入口（app 包不导入本模块，避免 python -m 运行时模块被重复加载）。
+
+运行方式（在项目根目录）：
+    RPC_CONSUMER_EMBEDDED=0 python -m app.consumer_main --workers 4
+
+导入 app 包时是否启动内嵌消费者只由 RPC_CONSUMER_EMBEDDED 决定，本入口要求设置为 0，消费者进程由本入口启动。
+"""
+import argparse
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.parallel_marking import default_pool_workers, parallel_marker
+from app.services.rabbitmq_rpc_server import run_consumer_processes
+from app.utils.rule_manager import rule_manager
+
+# 获取日志记录器
+logger = get_logger()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="独立运行的文件打标 RPC 消费者")
+    parser.add_argument("--workers", type=int, default=Config.RPC_CONSUMER_PROCESSES,
+                        help="消费者进程数")
+    parser.add_argument("--pool-workers", type=int, default=None,
+                        help="每个消费者进程用于大批量打标的子进程数，1 表示不使用进程池")
+    args = parser.parse_args(argv)
+    if Config.RPC_CONSUMER_EMBEDDED:
+        parser.error("请设置环境变量 RPC_CONSUMER_EMBEDDED=0 后运行，避免在主进程中再启动一个内嵌消费者")
+    # 未指定时按本机的消费者进程数平分 CPU 核数
+    parallel_marker.workers = args.pool_workers if args.pool_workers is not None else default_pool_workers(args.workers)
+    rules = rule_manager.current()
+    logger.info(f"独立消费者启动: 进程数 {args.workers}, 规则版本 {rules.checksum[:12]}")
+    run_consumer_processes(args.workers)
+
+
+if __name__ == "__main__":
+    main()
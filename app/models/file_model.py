@@ -6,8 +6,8 @@ class FileRecord(db.Model):
     __tablename__ = 'file_records'  # 设置表名
 
     id = db.Column(db.Integer, primary_key=True)
-    file_path = db.Column(db.String(255), nullable=False)
-    processed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    file_path = db.Column(db.String(255), nullable=False, index=True)
+    processed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     def __init__(self, file_path, processed_at=None):
         self.file_path = file_path
@@ -17,3 +17,74 @@ class FileRecord(db.Model):
 
     def __repr__(self):
         return f"<FileRecord {self.file_path}>"
+
+
+class FileTagRecord(db.Model):
+    """文件打标结果：同一文件（neid）的同一版本（rev）在同一份规则（rule_checksum）下的标签"""
+    __tablename__ = 'file_tag_records'
+    __table_args__ = (
+        db.UniqueConstraint('neid', 'rev', 'rule_checksum', name='uq_file_tag_neid_rev_rule'),
+        db.Index('ix_file_tag_rule_checksum', 'rule_checksum'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    neid = db.Column(db.String(64), nullable=False)
+    rev = db.Column(db.String(64), nullable=False)
+    rule_checksum = db.Column(db.String(64), nullable=False)  # 规则文件内容的 sha256 摘要，跨进程稳定
+    path = db.Column(db.String(1024), nullable=False)  # 打标时的路径，重命名后需要重新打标
+    tag = db.Column(db.Text, nullable=False)
+    marked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<FileTagRecord {self.neid}@{self.rev}>"
+
+
+class FolderSnapshotEntry(db.Model):
+    """增量同步的目录快照：同步根目录（nsid, root_path）下上次同步时每个文件的版本"""
+    __tablename__ = 'folder_snapshot_entries'
+    __table_args__ = (
+        db.UniqueConstraint('nsid', 'root_path', 'neid', name='uq_folder_snapshot_root_neid'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    nsid = db.Column(db.Integer, nullable=False)
+    root_path = db.Column(db.String(512), nullable=False)  # 同步的根目录
+    neid = db.Column(db.String(64), nullable=False)
+    rev = db.Column(db.String(64), nullable=False)
+    modified = db.Column(db.String(64), nullable=True)
+    path = db.Column(db.String(1024), nullable=False)
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<FolderSnapshotEntry {self.root_path}:{self.neid}@{self.rev}>"
+
+
+class MarkJobRecord(db.Model):
+    """异步打标任务的状态，多个 Web 工作进程共享"""
+    __tablename__ = 'mark_jobs'
+
+    job_id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False, index=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    result_count = db.Column(db.Integer, nullable=True)  # 成功完成后的结果条数
+    created_at = db.Column(db.Float(precision=53), nullable=False)  # 时间戳（秒）
+    finished_at = db.Column(db.Float(precision=53), nullable=True, index=True)
+    timeout = db.Column(db.Float(precision=53), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    stats = db.Column(db.Text, nullable=True)  # JSON
+
+    def __repr__(self):
+        return f"<MarkJobRecord {self.job_id} {self.status}>"
+
+
+class MarkJobResult(db.Model):
+    """异步打标任务的结果，每条结果一行，按 seq 分页读取"""
+    __tablename__ = 'mark_job_results'
+
+    job_id = db.Column(db.String(32), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+
+    def __repr__(self):
+        return f"<MarkJobResult {self.job_id}#{self.seq}>"
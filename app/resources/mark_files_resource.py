@@ -1,12 +1,13 @@
-import json
 from flask_restful import Resource
 from flask import request
 from marshmallow import ValidationError
 
+from app.config import Config
 from app.logger import get_logger
-from app.schemas.file_schema import FileListSchema
+from app.schemas.fast_validator import load_file_list
 from app.utils.response_container import BaseResponse
-from app.services.rabbitmq_service import rabbitmq_rpc
+from app.services.job_service import submit_mark_job
+from app.services.mark_dispatcher import mark_files_remote
 
 # 获取日志记录器
 logger = get_logger()
@@ -14,9 +15,8 @@ logger = get_logger()
 
 class MarkFilesResource(Resource):
     def post(self):
-        schema = FileListSchema()
         try:
-            data = schema.load(request.get_json())
+            data = load_file_list(request.get_json())
         except ValidationError as err:
             response = BaseResponse(
                 code=400,
@@ -27,14 +27,27 @@ class MarkFilesResource(Resource):
             logger.error("文件数据参数有误，请检查: %s", err.messages)
             return response.to_json()
 
-        # 组装 RPC 请求消息：包含任务类型、文件列表和路径类型
-        task_message = {
-            "task_type": "mark_files",
-            "fileModelList": data.get("fileModelList"),
-        }
+        # 异步模式（?mode=async）：立即返回任务 ID，结果通过 /files/mark/jobs/<job_id> 查询
+        if request.args.get("mode") == "async":
+            try:
+                job = submit_mark_job(data.get("fileModelList"))
+            except Exception as e:
+                response = BaseResponse(
+                    code=500,
+                    status=500,
+                    message="打标任务提交失败",
+                    data={"error": str(e)}
+                )
+                logger.error("打标任务提交失败: %s", e)
+                return response.to_json()
+            logger.info("已提交异步打标任务 %s，共 %s 个文件", job.job_id, job.total)
+            response = BaseResponse(message="打标任务已提交", data=job.summary())
+            return response.to_json()
+
+        # 通过 RPC 打标，大列表拆分为多个分片由多个消费者并行处理
         try:
-            rpc_response = rabbitmq_rpc.call(json.dumps(task_message))
-            result_data = json.loads(rpc_response)
+            future = mark_files_remote(data.get("fileModelList"), timeout=Config.RPC_TIMEOUT)
+            result_data = future.result(timeout=Config.RPC_TIMEOUT)
         except Exception as e:
             response = BaseResponse(
                 code=500,
@@ -42,7 +55,7 @@ class MarkFilesResource(Resource):
                 message="打标任务处理出错",
                 data={"error": str(e)}
             )
-            logger.error("打标任务处理出错", e)
+            logger.error("打标任务处理出错: %s", e)
             return response.to_json()
 
         # response_data = {
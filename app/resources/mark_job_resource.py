@@ -0,0 +1,67 @@
+from flask_restful import Resource
+from flask import request
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.job_service import JOB_SUCCESS, job_store
+from app.utils.response_container import BaseResponse, ListData
+
+# 获取日志记录器
+logger = get_logger()
+
+
+def _job_not_found(job_id):
+    response = BaseResponse(
+        code=404,
+        status=404,
+        message="打标任务不存在或已过期",
+        data={"job_id": job_id}
+    )
+    return response.to_json()
+
+
+class MarkJobResource(Resource):
+    def get(self, job_id):
+        """查询异步打标任务状态"""
+        job = job_store.get(job_id)
+        if job is None:
+            return _job_not_found(job_id)
+        response = BaseResponse(data=job.summary())
+        return response.to_json()
+
+
+class MarkJobResultResource(Resource):
+    def get(self, job_id):
+        """分页获取异步打标任务结果，参数 page_num 从 0 开始，page_size 默认 100"""
+        job = job_store.get(job_id)
+        if job is None:
+            return _job_not_found(job_id)
+        if job.status != JOB_SUCCESS:
+            response = BaseResponse(
+                code=409,
+                status=409,
+                message="打标任务尚未成功完成",
+                data=job.summary()
+            )
+            return response.to_json()
+
+        page_num = request.args.get("page_num", 0, type=int)
+        page_size = request.args.get("page_size", 100, type=int)
+        if page_num is None or page_num < 0 or page_size is None \
+                or not 0 < page_size <= Config.MARK_JOB_MAX_PAGE_SIZE:
+            response = BaseResponse(
+                code=400,
+                status=400,
+                message="分页参数有误",
+                data={"error": f"page_num 不能为负数，page_size 取值范围为 1~{Config.MARK_JOB_MAX_PAGE_SIZE}"}
+            )
+            return response.to_json()
+
+        try:
+            total, items = job_store.result_page(job, page_num * page_size, page_size)
+        except Exception as e:
+            logger.error("读取打标任务 %s 结果失败: %s", job_id, e)
+            response = BaseResponse(code=500, status=500, message="读取打标任务结果失败", data={"error": str(e)})
+            return response.to_json()
+        response = BaseResponse(data=ListData(total=total, items=items))
+        return response.to_json()
@@ -0,0 +1,157 @@
+import json
+
+from flask_restful import Resource
+from flask import Response, request
+from marshmallow import ValidationError
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
+
+from app.config import Config
+from app.logger import get_logger
+from app.schemas.fast_validator import load_file_item
+from app.schemas.file_schema import FileListSchema
+from app.services.mark_dispatcher import iter_mark_results
+from app.utils.json_stream import JsonStreamError, iter_object_stream
+from app.utils.response_container import BaseResponse
+
+# 获取日志记录器
+logger = get_logger()
+
+FORMAT_JSON = "json"
+FORMAT_NDJSON = "ndjson"
+
+
+class StreamingMarkRequest:
+    """
+    流式打标请求：增量解析请求体中的 fileModelList，逐个校验后按批次发送打标，
+    结果按输入顺序逐条产出。同时在途的批次数有上限，内存占用不随请求大小增长。
+    errcode、errmsg、total 等顶层字段在解析到时立即校验，位于 fileModelList 之前的字段校验失败直接返回 400；
+    文件数超过一批时，位于 fileModelList 之后的字段和缺少的必填字段要等读到请求体末尾才能发现，
+    此时响应已经开始返回，错误附加在响应末尾。
+    """
+
+    def __init__(self, stream):
+        self.header = {}
+        self.seen_file_list = False
+        self._items = iter_object_stream(stream, "fileModelList", on_field=self._on_field)
+        self._index = 0
+        self._pending = []
+        self._exhausted = False  # 请求体是否已全部解析
+
+    def _on_field(self, key, value):
+        if key not in FileListSchema._declared_fields:
+            raise ValidationError({key: ["Unknown field."]})
+        # fileModelList 不是数组时也会走到这里，由 schema 报告类型错误
+        FileListSchema(only=(key,)).load({key: value})
+        if key == "fileModelList":
+            self.seen_file_list = True
+        self.header[key] = value
+
+    def _next_batch(self) -> list:
+        batch = []
+        for item in self._items:
+            self.seen_file_list = True
+            try:
+                batch.append(load_file_item(item))
+            except ValidationError as err:
+                raise ValidationError({"fileModelList": {self._index: err.messages}})
+            self._index += 1
+            if len(batch) >= Config.MARK_STREAM_BATCH_SIZE:
+                break
+        else:
+            self._exhausted = True
+        return batch
+
+    def prime(self):
+        """预先解析第一批数据，请求体开头的格式错误可以在返回响应前发现；不超过一批时同时检查必填字段"""
+        self._pending = self._next_batch()
+        if self._exhausted:
+            self._validate_header()
+
+    def _validate_header(self):
+        """各字段已在解析时校验，这里检查必填字段是否齐全"""
+        data = dict(self.header)
+        if self.seen_file_list and "fileModelList" not in data:
+            data["fileModelList"] = []
+        FileListSchema(only=("errcode", "errmsg", "total", "fileModelList")).load(data)
+
+    def _batches(self):
+        batch = self._pending
+        self._pending = []
+        while batch:
+            yield batch
+            batch = self._next_batch()
+
+    def results(self):
+        """逐条产出 {"neid": ..., "tag": ...}，顺序与输入一致"""
+        yield from iter_mark_results(self._batches(), Config.MARK_STREAM_MAX_INFLIGHT, Config.RPC_TIMEOUT)
+        self._validate_header()
+
+
+def _error_detail(error) -> dict:
+    if isinstance(error, ValidationError):
+        return {"message": "文件数据参数有错", "error": error.messages}
+    if isinstance(error, JsonStreamError):
+        return {"message": "请求数据格式错误", "error": str(error)}
+    return {"message": "打标任务处理出错", "error": str(error)}
+
+
+class MarkFilesStreamResource(Resource):
+    def post(self):
+        """
+        流式打标：请求体按 /files/mark 的格式增量解析，结果以分块方式返回。
+        ?format=json（默认）返回统一响应结构，data 为结果数组；?format=ndjson 每行一个结果。
+        处理中途出错时，json 格式在响应末尾附加 error 字段，ndjson 格式追加一行 {"error": ...}。
+        """
+        output_format = request.args.get("format", FORMAT_JSON)
+        if output_format not in (FORMAT_JSON, FORMAT_NDJSON):
+            response = BaseResponse(code=400, status=400, message="Invalid input",
+                                    data={"error": "format must be 'json' or 'ndjson'."})
+            return response.to_json()
+
+        try:
+            # 流式接口使用独立的请求体大小限制，不受全局 MAX_CONTENT_LENGTH 约束
+            stream = get_input_stream(request.environ, max_content_length=Config.MARK_STREAM_MAX_CONTENT_LENGTH)
+            mark_request = StreamingMarkRequest(stream)
+            mark_request.prime()
+        except RequestEntityTooLarge as e:
+            response = BaseResponse(code=413, status=413, message="请求数据过大", data={"error": str(e)})
+            return response.to_json()
+        except (ValidationError, JsonStreamError) as e:
+            detail = _error_detail(e)
+            logger.error("流式打标请求参数有误: %s", detail["error"])
+            response = BaseResponse(code=400, status=400, message=detail["message"], data={"error": detail["error"]})
+            return response.to_json()
+
+        def generate_json():
+            yield '{"code": 200, "status": 200, "message": "请求成功", "data": ['
+            count = 0
+            error = None
+            try:
+                for result in mark_request.results():
+                    yield ("," if count else "") + json.dumps(result, ensure_ascii=False)
+                    count += 1
+            except Exception as e:
+                error = _error_detail(e)
+                logger.error("流式打标处理出错: %s", error["error"])
+            if error is None:
+                yield "]}"
+            else:
+                yield "], " + json.dumps({"error": error}, ensure_ascii=False)[1:]
+            logger.info("流式打标完成，共 %s 条", count)
+
+        def generate_ndjson():
+            count = 0
+            try:
+                for result in mark_request.results():
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+                    count += 1
+            except Exception as e:
+                error = _error_detail(e)
+                logger.error("流式打标处理出错: %s", error["error"])
+                yield json.dumps({"error": error}, ensure_ascii=False) + "\n"
+            logger.info("流式打标完成，共 %s 条", count)
+
+        if output_format == FORMAT_NDJSON:
+            return Response(generate_ndjson(), mimetype="application/x-ndjson")
+        return Response(generate_json(), mimetype="application/json")
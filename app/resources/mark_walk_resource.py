@@ -0,0 +1,62 @@
+from flask_restful import Resource
+from flask import request
+from marshmallow import ValidationError
+
+from app.logger import get_logger
+from app.schemas.file_schema import SyncMarkRequestSchema, WalkMarkRequestSchema
+from app.services.job_service import submit_sync_job, submit_walk_job
+from app.utils.response_container import BaseResponse
+
+# 获取日志记录器
+logger = get_logger()
+
+
+def _invalid_request(err: ValidationError):
+    response = BaseResponse(
+        code=400,
+        status=400,
+        message="请求参数有误",
+        data={"error": err.messages}
+    )
+    logger.error("目录打标请求参数有误: %s", err.messages)
+    return response.to_json()
+
+
+class MarkWalkResource(Resource):
+    def post(self):
+        """
+        递归遍历目录并打标：立即返回任务，进度和结果通过 /files/mark/jobs/<job_id> 查询。
+        """
+        try:
+            data = WalkMarkRequestSchema().load(request.get_json())
+        except ValidationError as err:
+            return _invalid_request(err)
+
+        max_depth = data.pop("max_depth")
+        max_files = data.pop("max_files")
+        slug = data.pop("slug")
+        job = submit_walk_job(data, max_depth=max_depth, max_files=max_files, slug=slug)
+        logger.info("已提交目录打标任务 %s: %s", job.job_id, data.get("path"))
+        response = BaseResponse(message="目录打标任务已提交", data=job.summary())
+        return response.to_json()
+
+
+class MarkSyncResource(Resource):
+    def post(self):
+        """
+        增量同步目录：只对上次同步以来新增和变化的文件打标，并报告已删除的文件。
+        立即返回任务，进度和结果通过 /files/mark/jobs/<job_id> 查询。
+        """
+        try:
+            data = SyncMarkRequestSchema().load(request.get_json())
+        except ValidationError as err:
+            return _invalid_request(err)
+
+        nsid = data.pop("nsid")
+        max_depth = data.pop("max_depth")
+        max_files = data.pop("max_files")
+        slug = data.pop("slug")
+        job = submit_sync_job(data, nsid=nsid, max_depth=max_depth, max_files=max_files, slug=slug)
+        logger.info("已提交增量同步任务 %s: %s", job.job_id, data.get("path"))
+        response = BaseResponse(message="增量同步任务已提交", data=job.summary())
+        return response.to_json()
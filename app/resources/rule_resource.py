@@ -0,0 +1,49 @@
+from flask_restful import Resource
+from flask import request
+
+from app.logger import get_logger
+from app.services.file_service import mark_result_cache
+from app.services.rabbitmq_service import broadcast_rule_reload
+from app.utils.response_container import BaseResponse
+from app.utils.rule_manager import rule_manager
+
+# 获取日志记录器
+logger = get_logger()
+
+
+class RuleReloadResource(Resource):
+    def get(self):
+        """查询当前生效的打标规则版本"""
+        rules = rule_manager.current()
+        response = BaseResponse(data={
+            "version": rules.version,
+            "checksum": rules.checksum,
+            "loaded_at": rules.loaded_at,
+            "mark_cache": mark_result_cache.stats() if mark_result_cache is not None else None,
+        })
+        return response.to_json()
+
+    def post(self):
+        """
+        在后台重新加载打标规则，编译完成后原子切换，并广播通知所有 RPC 消费者进程重新加载。
+        返回的 version、checksum 为当前 Web 进程的规则，消费者各自异步完成切换。
+        """
+        payload = request.get_json(silent=True) or {}
+        force = bool(payload.get("force", False))
+        started = rule_manager.reload_async(force=force)
+        try:
+            broadcast_rule_reload(force=force)
+            broadcast = True
+        except Exception as e:
+            logger.error("通知消费者重新加载规则失败: %s", e)
+            broadcast = False
+        rules = rule_manager.current()
+        logger.info("收到规则重新加载请求，当前版本 %s", rules.version)
+        message = "规则正在重新加载" if started else "规则重新加载已在进行中"
+        if not broadcast:
+            message += "，通知消费者失败，仅当前 Web 进程生效"
+        response = BaseResponse(
+            message=message,
+            data={"reloading": started, "broadcast": broadcast, "version": rules.version, "checksum": rules.checksum}
+        )
+        return response.to_json()
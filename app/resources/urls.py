@@ -1,8 +1,18 @@
 # from app.resources.file_resource import FileResource, RenameFilesResource
 from app.resources.mark_files_resource import MarkFilesResource
+from app.resources.mark_stream_resource import MarkFilesStreamResource
+from app.resources.mark_walk_resource import MarkSyncResource, MarkWalkResource
+from app.resources.mark_job_resource import MarkJobResource, MarkJobResultResource
+from app.resources.rule_resource import RuleReloadResource
 from app import api  # 导入已经初始化的 api 实例
 
 # 确保正确添加资源路由
 # api.add_resource(FileResource, '/files/process')
 # api.add_resource(RenameFilesResource, '/files/rename')
 api.add_resource(MarkFilesResource, '/files/mark')
+api.add_resource(MarkFilesStreamResource, '/files/mark/stream')
+api.add_resource(MarkWalkResource, '/files/mark/walk')
+api.add_resource(MarkSyncResource, '/files/mark/sync')
+api.add_resource(MarkJobResource, '/files/mark/jobs/<string:job_id>')
+api.add_resource(MarkJobResultResource, '/files/mark/jobs/<string:job_id>/result')
+api.add_resource(RuleReloadResource, '/rules/reload')
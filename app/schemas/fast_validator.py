@@ -0,0 +1,98 @@
+from marshmallow import fields, missing
+
+from app.config import Config
+from app.schemas.file_schema import FileListSchema, FileModelSchema
+
+###########################
+# 文件列表快速校验
+###########################
+# 根据 FileModelSchema 的字段定义生成一个校验函数，只检查字段是否齐全、类型是否已经是目标类型。
+# 全部文件通过时直接使用原始数据（仅补齐默认值）；任何一项不满足时回退到 marshmallow 完整校验，
+# 因此错误信息与 FileListSchema 完全一致，且快速通过的数据与 schema.load 的结果相同。
+
+_TYPE_CHECKS = (
+    (fields.Boolean, "bool"),
+    (fields.Integer, "int"),
+    (fields.String, "str"),
+)
+
+
+def _python_type(field):
+    for field_class, type_name in _TYPE_CHECKS:
+        if isinstance(field, field_class):
+            return type_name
+    return None
+
+
+def _load_default(field):
+    return getattr(field, "load_default", getattr(field, "missing", missing))
+
+
+def compile_item_validator(schema_class):
+    """
+    为 schema 的单个对象生成校验函数，返回 (validator, defaults)。
+    validator(item) 为 True 表示该对象与 schema.load 的结果完全相同（缺省字段除外）；
+    defaults 为缺省时需要补齐的字段默认值。
+    """
+    declared = schema_class._declared_fields
+    conditions = ["type(item) is dict", "item.keys() <= allowed"]
+    defaults = {}
+    for name, field in declared.items():
+        type_name = _python_type(field)
+        if type_name is None or field.data_key or field.validate:
+            # 含有自定义 data_key 或校验器的字段不走快速路径
+            return (lambda item: False), {}
+        accepted = type_name if not field.allow_none else f"{type_name}, NoneType"
+        if field.required:
+            conditions.append(f"type(item.get({name!r})) in ({accepted},)")
+        else:
+            default = _load_default(field)
+            if default is not missing:
+                defaults[name] = default
+            conditions.append(f"({name!r} not in item or type(item[{name!r}]) in ({accepted},))")
+    source = "def validate(item):\n    return " + " and \\\n        ".join(conditions) + "\n"
+    namespace = {"allowed": frozenset(declared), "NoneType": type(None)}
+    exec(compile(source, f"<{schema_class.__name__} validator>", "exec"), namespace)
+    return namespace["validate"], defaults
+
+
+_validate_file_item, _file_item_defaults = compile_item_validator(FileModelSchema)
+_file_item_schema = FileModelSchema()
+# FileListSchema 中除 fileModelList 外的字段
+_LIST_HEADER_FIELDS = {"errcode": str, "errmsg": str, "total": int}
+
+
+def fast_load_file_list(payload) -> dict:
+    """
+    快速校验文件列表请求，结果与 FileListSchema().load(payload) 相同；
+    数据不满足快速路径条件时回退到 FileListSchema 校验（校验失败抛出 ValidationError）。
+    """
+    if (type(payload) is dict
+            and payload.keys() == {*_LIST_HEADER_FIELDS, "fileModelList"}
+            and all(type(payload[name]) is expected for name, expected in _LIST_HEADER_FIELDS.items())
+            and type(payload["fileModelList"]) is list
+            and all(map(_validate_file_item, payload["fileModelList"]))):
+        if _file_item_defaults:
+            for item in payload["fileModelList"]:
+                for name, default in _file_item_defaults.items():
+                    if name not in item:
+                        item[name] = default() if callable(default) else default
+        return payload
+    return FileListSchema().load(payload)
+
+
+def load_file_item(item) -> dict:
+    """校验单个文件对象（流式解析时逐个校验），校验方式与 load_file_list 相同"""
+    if Config.VALIDATION_MODE == "fast" and _validate_file_item(item):
+        for name, default in _file_item_defaults.items():
+            if name not in item:
+                item[name] = default() if callable(default) else default
+        return item
+    return _file_item_schema.load(item)
+
+
+def load_file_list(payload) -> dict:
+    """按 VALIDATION_MODE 配置选择校验方式：schema 为 marshmallow 完整校验，fast 为快速校验"""
+    if Config.VALIDATION_MODE == "fast":
+        return fast_load_file_list(payload)
+    return FileListSchema().load(payload)
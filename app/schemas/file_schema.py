@@ -60,3 +60,29 @@ class GetFileListRequestSchema(ma.Schema):
         validate=validate.Range(min=0, max=999),
         error_messages={"invalid": "page_size must be between 0 and 999."}
     )
+
+
+class WalkMarkRequestSchema(ma.Schema):
+    path = fields.Str(required=True, error_messages={"required": "Path is required."})
+    path_type = fields.Str(
+        required=True,
+        validate=validate.OneOf(["ent", "self"]),
+        error_messages={"required": "Path type is required.", "validator_failed": "Path type must be 'ent' or 'self'."}
+    )
+    sort = fields.Str(missing="desc", validate=validate.OneOf(["asc", "desc"]))
+    order_by = fields.Str(missing="mtime", validate=validate.OneOf(["name", "size", "mtime"]))
+    max_depth = fields.Int(
+        missing=None,
+        validate=validate.Range(min=0),
+        error_messages={"invalid": "max_depth must be a non-negative integer."}
+    )
+    max_files = fields.Int(
+        missing=None,
+        validate=validate.Range(min=0),
+        error_messages={"invalid": "max_files must be a non-negative integer."}
+    )
+    slug = fields.Str(missing=None)  # 代表调用的用户登录名，为空时使用配置的默认值
+
+
+class SyncMarkRequestSchema(WalkMarkRequestSchema):
+    nsid = fields.Int(missing=None, error_messages={"invalid": "nsid must be an integer."})
@@ -0,0 +1,340 @@
+"""
+批量打标命令行：遍历外部目录 -> 打标 -> 保存结果，三个阶段流水线并行，不经过 Web 服务和 RabbitMQ。
+
+运行方式（在项目根目录）：
+    RPC_CONSUMER_EMBEDDED=0 python -m app.services.batch_pipeline --path /企业空间 --path-type ent \\
+        --checkpoint nightly.ckpt --output nightly.jsonl
+
+中断后使用相同参数再次运行即从断点继续：断点文件记录已完成（文件已打标并保存）的目录及其子目录，
+续跑时这些目录不再读取。打标结果写入数据库失败时按 PIPELINE_SAVE_RETRIES 重试，仍失败则停止，
+该批次的目录不记入断点。全部完成且没有目录读取失败时删除断点文件。
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.namespace_walker import FolderDone, NamespaceWalker
+from app.services.parallel_marking import parallel_marker
+from app.services.tag_store import tag_store
+from app.utils.rule_manager import rule_manager
+
+# 获取日志记录器
+logger = get_logger()
+
+_END = object()  # 上游阶段结束
+
+
+class StageStats:
+    """单个阶段的吞吐统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0  # 实际处理耗时（不含等待上下游队列）
+        self.started = time.monotonic()
+
+    def record(self, items: int, elapsed: float):
+        self.items += items
+        self.batches += 1
+        self.busy += elapsed
+
+    def report(self) -> str:
+        wall = max(time.monotonic() - self.started, 1e-9)
+        return (f"{self.name}: {self.items} 个文件 / {self.batches} 批, "
+                f"{self.items / wall:.0f} 个/秒, 繁忙 {self.busy / wall:.0%}")
+
+
+class Checkpoint:
+    """
+    断点文件（JSON Lines）：第一行记录根目录和规则摘要，之后每行一个已完成的目录及其子目录。
+    只追加写入，进程中断时最后一行可能不完整，读取时忽略。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def load(self, header: dict) -> dict:
+        """读取与 header 匹配的断点，返回 {目录: [子目录]}；不存在或不匹配时返回空字典"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        completed = {}
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        try:
+            saved_header = json.loads(lines[0]) if lines else None
+        except ValueError:
+            saved_header = None
+        if saved_header != header:
+            logger.warning(f"断点文件 {self.path} 与本次任务（根目录或规则版本）不一致，重新开始")
+            return {}
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            completed[entry["folder"]] = entry["children"]
+        return completed
+
+    def open(self, header: dict, resume: bool):
+        if not self.path:
+            return
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if not resume:
+            self._file.write(json.dumps(header, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def append(self, folders: list):
+        if self._file is None or not folders:
+            return
+        for folder in folders:
+            self._file.write(json.dumps({"folder": folder.path, "children": folder.children}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, remove: bool = False):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BatchPipeline:
+    """
+    三阶段流水线，阶段之间通过有界队列传递批次：
+      遍历：NamespaceWalker 分页读取目录树，文件按 batch_size 分批，批次附带此前已读取完成的目录；
+      打标：使用本次任务固定的规则快照，已保存结果的文件直接复用，其余文件通过进程池打标；
+      保存：批量写入打标结果和输出文件，写入成功后才把批次附带的目录记入断点。
+    各阶段按顺序处理批次，目录记入断点时其全部文件都已保存。
+    未启用打标结果持久化（MARK_RESULT_STORE）时只写入输出文件，此时必须指定 output_path。
+    """
+
+    def __init__(self, params: dict, checkpoint_path: str = None, output_path: str = None,
+                 batch_size: int = None, queue_size: int = None, max_depth: int = None,
+                 max_files: int = None, slug: str = None, fresh: bool = False, report_interval: float = None):
+        if not tag_store.enabled and not output_path:
+            raise ValueError("未启用打标结果持久化（MARK_RESULT_STORE）时必须指定输出文件")
+        self.params = params
+        self.batch_size = max(1, batch_size or Config.PIPELINE_BATCH_SIZE)
+        self.queue_size = max(1, queue_size or Config.PIPELINE_QUEUE_SIZE)
+        self.report_interval = report_interval if report_interval is not None else Config.PIPELINE_REPORT_INTERVAL
+        self.output_path = output_path
+        self.fresh = fresh
+        self.rules = rule_manager.current()
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.header = {"path": params.get("path"), "path_type": params.get("path_type"),
+                       "rule_checksum": self.rules.checksum}
+        self.completed_folders = {} if fresh else self.checkpoint.load(self.header)
+        self.walker = NamespaceWalker(params, max_depth=max_depth, max_files=max_files, slug=slug,
+                                      completed_folders=self.completed_folders, emit_folder_events=True)
+        self.stats = [StageStats("遍历"), StageStats("打标"), StageStats("保存")]
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_stage(self, name: str, func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"批量打标{name}阶段出错: {e}")
+            self._errors.append(f"{name}: {e}")
+            self._stop.set()
+
+    def _crawl(self, out_q: queue.Queue):
+        stats = self.stats[0]
+        files, folders = [], []
+        start = time.perf_counter()
+        items = iter(self.walker)
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    return
+                if isinstance(item, FolderDone):
+                    folders.append(item)
+                    continue
+                files.append(item)
+                if len(files) >= self.batch_size:
+                    stats.record(len(files), time.perf_counter() - start)
+                    if not self._put(out_q, (files, folders)):
+                        return
+                    files, folders = [], []
+                    start = time.perf_counter()
+        finally:
+            # 提前结束时停止遍历线程
+            items.close()
+        if files or folders:
+            stats.record(len(files), time.perf_counter() - start)
+            self._put(out_q, (files, folders))
+        self._put(out_q, _END)
+
+    def _mark(self, in_q: queue.Queue, out_q: queue.Queue):
+        stats = self.stats[1]
+        while True:
+            item = self._get(in_q)
+            if item is _END:
+                break
+            files, folders = item
+            start = time.perf_counter()
+            records = []
+            if tag_store.enabled:
+                # 结果由保存阶段统一写入
+                tags = tag_store.mark_incremental(
+                    files, self.rules.checksum,
+                    lambda file_list: parallel_marker.mark_file_list(file_list, self.rules, error_value=None),
+                    save_fn=records.extend,
+                )
+            else:
+                tags = parallel_marker.mark_file_list(files, self.rules)
+            stats.record(len(files), time.perf_counter() - start)
+            if not self._put(out_q, (files, folders, tags, records)):
+                return
+        self._put(out_q, _END)
+
+    def _persist(self, in_q: queue.Queue, output_file):
+        stats = self.stats[2]
+        while True:
+            item = self._get(in_q)
+            if item is _END:
+                break
+            files, folders, tags, records = item
+            start = time.perf_counter()
+            if tag_store.enabled:
+                self._save_records(records)
+            if output_file is not None:
+                output_file.writelines(
+                    json.dumps({"neid": file_item.get("neid"), "path": file_item.get("path"), "tag": tag},
+                               ensure_ascii=False) + "\n"
+                    for file_item, tag in zip(files, tags)
+                )
+                output_file.flush()
+            self.checkpoint.append(folders)
+            stats.record(len(files), time.perf_counter() - start)
+
+    def _save_records(self, records: list):
+        """写入打标结果，失败时重试；重试仍失败则抛出异常停止流水线，本批目录不记入断点"""
+        attempt = 0
+        while True:
+            try:
+                tag_store.save(self.rules.checksum, records, raise_errors=True)
+                return
+            except Exception as e:
+                attempt += 1
+                if attempt > Config.PIPELINE_SAVE_RETRIES or self._stop.is_set():
+                    raise
+                logger.warning(f"保存打标结果失败，{Config.PIPELINE_SAVE_RETRY_DELAY} 秒后第 {attempt} 次重试: {e}")
+                self._stop.wait(Config.PIPELINE_SAVE_RETRY_DELAY)
+
+    def _report(self):
+        line = "; ".join(stage.report() for stage in self.stats)
+        logger.info(f"批量打标进度: {line}")
+        print(line, flush=True)
+
+    def run(self) -> dict:
+        resume = bool(self.completed_folders)
+        if resume:
+            logger.info(f"从断点继续，已完成目录 {len(self.completed_folders)} 个")
+            print(f"从断点继续，已完成目录 {len(self.completed_folders)} 个", flush=True)
+        self.checkpoint.open(self.header, resume)
+        output_file = open(self.output_path, 'a' if resume else 'w', encoding='utf-8') if self.output_path else None
+        crawl_q = queue.Queue(maxsize=self.queue_size)
+        persist_q = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._run_stage, args=("遍历", self._crawl, crawl_q), name="pipeline-crawl"),
+            threading.Thread(target=self._run_stage, args=("打标", self._mark, crawl_q, persist_q), name="pipeline-mark"),
+            threading.Thread(target=self._run_stage, args=("保存", self._persist, persist_q, output_file),
+                             name="pipeline-persist"),
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            while threads[-1].is_alive():
+                threads[-1].join(timeout=self.report_interval)
+                if threads[-1].is_alive():
+                    self._report()
+        except KeyboardInterrupt:
+            logger.warning("批量打标被中断，已完成的目录已记入断点")
+            self._errors.append("interrupted")
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            if output_file is not None:
+                output_file.close()
+            complete = not self._errors and not self.walker.errors and not self.walker.truncated
+            self.checkpoint.close(remove=complete)
+        self._report()
+        summary = {
+            "complete": complete,
+            "elapsed": round(time.monotonic() - started, 1),
+            "files": self.stats[2].items,
+            "rule_checksum": self.rules.checksum,
+            "walk": self.walker.stats(),
+            "errors": self._errors,
+        }
+        logger.info(f"批量打标结束: {summary}")
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量打标：遍历外部目录、打标并保存结果")
+    parser.add_argument("--path", required=True, help="根目录路径")
+    parser.add_argument("--path-type", required=True, choices=["ent", "self"], help="路径类型")
+    parser.add_argument("--slug", default=None, help="代表调用的用户登录名")
+    parser.add_argument("--checkpoint", default=None, help="断点文件路径，为空时不支持续跑")
+    parser.add_argument("--output", default=None, help="打标结果输出文件（JSON Lines）")
+    parser.add_argument("--fresh", action="store_true", help="忽略已有断点，重新开始")
+    parser.add_argument("--batch-size", type=int, default=None, help="每批文件数")
+    parser.add_argument("--queue-size", type=int, default=None, help="阶段之间缓冲的批次数")
+    parser.add_argument("--max-depth", type=int, default=None, help="最大遍历深度")
+    parser.add_argument("--max-files", type=int, default=0, help="最多打标的文件数，0 表示不限")
+    parser.add_argument("--pool-workers", type=int, default=None, help="打标子进程数，1 表示不使用进程池")
+    parser.add_argument("--report-interval", type=float, default=None, help="吞吐统计输出间隔（秒）")
+    args = parser.parse_args(argv)
+    if Config.RPC_CONSUMER_EMBEDDED:
+        # 导入 app 包时已按该设置启动了内嵌消费者，命令行进程不应消费 RabbitMQ 消息
+        parser.error("请设置环境变量 RPC_CONSUMER_EMBEDDED=0 后运行")
+    if args.pool_workers is not None:
+        parallel_marker.workers = args.pool_workers
+
+    if not tag_store.enabled and not args.output:
+        parser.error("未启用打标结果持久化（MARK_RESULT_STORE）时必须指定 --output")
+    pipeline = BatchPipeline(
+        {"path": args.path, "path_type": args.path_type, "sort": "desc", "order_by": "mtime"},
+        checkpoint_path=args.checkpoint, output_path=args.output, batch_size=args.batch_size,
+        queue_size=args.queue_size, max_depth=args.max_depth, max_files=args.max_files, slug=args.slug,
+        fresh=args.fresh, report_interval=args.report_interval,
+    )
+    try:
+        summary = pipeline.run()
+    finally:
+        parallel_marker.shutdown()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if summary["complete"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
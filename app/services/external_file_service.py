@@ -1,11 +1,66 @@
+import math
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
 import requests
+from requests.adapters import HTTPAdapter
 from app.logger import logger
 from app.config import Config
+from app.services.oauth_token_service import InvalidTokenError, parse_token_response, token_cache
+
+# 外部接口 page_size 的上限
+MAX_PAGE_SIZE = 999
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    获取共享的 requests.Session，连接池大小为 EXTERNAL_HTTP_POOL_SIZE，
+    同一主机的请求复用 TCP 连接。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=Config.EXTERNAL_HTTP_POOL_SIZE,
+                                      pool_maxsize=Config.EXTERNAL_HTTP_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _post_with_token(session: requests.Session, url: str, params: dict, slug: str) -> tuple[requests.Response, Any]:
+    """
+    携带 slug 对应的 token 发送请求；返回 invalid token 时作废该 token 并重试一次。
+    未配置 EXTERNAL_OAUTH_TOKEN_URL 时不携带 token。
+    :return: (响应, 已解析的响应 JSON)，未解析时 JSON 为 None
+    """
+    if not token_cache.enabled:
+        return session.post(url, json=params, timeout=Config.EXTERNAL_REQUEST_TIMEOUT), None
+    for attempt in range(2):
+        token = token_cache.get_token(slug)
+        response = session.post(url, json=params, timeout=Config.EXTERNAL_REQUEST_TIMEOUT,
+                                headers={"Authorization": f"{Config.EXTERNAL_TOKEN_AUTH_SCHEME} {token}"})
+        invalid, data = parse_token_response(response)
+        if not invalid:
+            return response, data
+        token_cache.invalidate(slug, token)
+        logger.warning(f"slug={slug!r} 的 token 已失效{'，重新获取后重试' if attempt == 0 else ''}")
+    raise InvalidTokenError(f"slug={slug!r} 重新获取 token 后仍返回 invalid token")
 
-def get_file_list_from_external(params: dict) -> dict:
+
+def get_file_list_from_external(params: dict, session: requests.Session = None, slug: str = None) -> dict:
     """
     调用外部接口（例如 /v2/getFileList）获取文件列表数据。
     :param params: 请求参数字典，包含 path、path_type、sort、order_by、page_num、page_size 等字段
+    :param session: 发送请求使用的 Session，默认使用共享连接池
+    :param slug: 代表调用的用户登录名，用于获取 token，默认 EXTERNAL_OAUTH_SLUG
     :return: 返回文件列表数据的字典，格式应为：
              {
                  "errcode": "0",
@@ -14,16 +69,72 @@ def get_file_list_from_external(params: dict) -> dict:
                  "total": <int>
              }
     """
-    # 示例：使用 requests.post 调用外部接口
     try:
         # 这里假设外部接口地址配置在 Config 中
         url = Config.EXTERNAL_FILE_LIST_URL  # 比如 "http://external-service/v2/getFileList"
-        response = requests.post(url, json=params, timeout=10)
+        session = session or get_session()
+        slug = slug if slug is not None else Config.EXTERNAL_OAUTH_SLUG
+        response, data = _post_with_token(session, url, params, slug)
         #raise_for_status() 方法会检查 HTTP 响应状态码，如果状态码表示错误（如 4xx 或 5xx），将自动抛出异常。这样可以及时捕获请求失败的情况。
         response.raise_for_status()
-        data = response.json()
-        logger.info(f"外部接口返回数据：{data}")
+        if data is None:
+            data = response.json()
+        logger.info(f"外部接口返回数据：page_num={params.get('page_num')}, "
+                    f"文件数 {len(data.get('fileModelList') or [])}, total={data.get('total')}")
         return data
     except Exception as e:
         logger.error(f"调用外部接口获取文件列表失败: {e}")
         raise e
+
+
+def _fetch_page(params: dict, page_num: int, page_size: int, session: requests.Session, slug: str) -> list:
+    data = get_file_list_from_external(dict(params, page_num=page_num, page_size=page_size), session, slug)
+    if str(data.get("errcode")) != "0":
+        raise RuntimeError(f"外部接口返回错误: errcode={data.get('errcode')}, errmsg={data.get('errmsg')}")
+    return data.get("fileModelList") or []
+
+
+def iter_file_list(params: dict, page_size: int = None, max_workers: int = None,
+                   session: requests.Session = None, slug: str = None):
+    """
+    分页读取一个目录下的全部文件，逐个产出 fileModelList 中的元素，顺序与分页顺序一致。
+    先读取第 0 页得到 total，其余页并发请求，同时在途的页数不超过 max_workers。
+    :param params: 请求参数（path、path_type、sort、order_by 等），page_num 和 page_size 由本函数设置
+    :param page_size: 每页数量，默认 EXTERNAL_PAGE_SIZE，上限 999
+    :param max_workers: 并发请求数，默认 EXTERNAL_CRAWL_WORKERS
+    :param session: 发送请求使用的 Session，默认使用共享连接池
+    :param slug: 代表调用的用户登录名，默认 EXTERNAL_OAUTH_SLUG
+    """
+    page_size = min(max(1, page_size or Config.EXTERNAL_PAGE_SIZE), MAX_PAGE_SIZE)
+    max_workers = max(1, max_workers or Config.EXTERNAL_CRAWL_WORKERS)
+    session = session or get_session()
+
+    first = get_file_list_from_external(dict(params, page_num=0, page_size=page_size), session, slug)
+    if str(first.get("errcode")) != "0":
+        raise RuntimeError(f"外部接口返回错误: errcode={first.get('errcode')}, errmsg={first.get('errmsg')}")
+    yield from first.get("fileModelList") or []
+
+    total = int(first.get("total") or 0)
+    page_count = math.ceil(total / page_size)
+    if page_count <= 1:
+        return
+    logger.info(f"分页读取 {params.get('path')}: total={total}, 共 {page_count} 页, 并发 {max_workers}")
+
+    pages = iter(range(1, page_count))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-list-crawler")
+    try:
+        inflight = deque()
+        for page_num in pages:
+            inflight.append(executor.submit(_fetch_page, params, page_num, page_size, session, slug))
+            if len(inflight) >= max_workers:
+                break
+        while inflight:
+            file_list = inflight.popleft().result()
+            # 按页序产出，已取走一页就补发下一页
+            next_page = next(pages, None)
+            if next_page is not None:
+                inflight.append(executor.submit(_fetch_page, params, next_page, page_size, session, slug))
+            yield from file_list
+    finally:
+        # 调用方提前停止迭代或出错时取消尚未开始的请求
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+from app.config import Config
+from app.logger import get_logger
+from app.utils.db_engine import get_db_engine
+
+# 获取日志记录器
+logger = get_logger()
+
+
+def _default_engine():
+    return get_db_engine(_file_record_table())
+
+
+def _file_record_table():
+    from app.models.file_model import FileRecord
+    return FileRecord.__table__
+
+
+def bulk_insert_file_records(records: list, batch_size: int = None, engine=None) -> int:
+    """
+    批量写入处理记录：每批一条多行 INSERT（executemany），整体在一个事务中提交。
+    路径超过 file_path 列长度的记录无法写入，跳过并记录错误，不影响同批的其他记录。
+    :param records: [(file_path, processed_at), ...]，processed_at 为空时使用当前时间
+    :param batch_size: 每批记录数，默认 FILE_RECORD_BATCH_SIZE
+    :param engine: 数据库引擎，默认使用应用的 db.engine
+    :return: 写入的记录数
+    """
+    if not records:
+        return 0
+    batch_size = max(1, batch_size or Config.FILE_RECORD_BATCH_SIZE)
+    engine = engine if engine is not None else _default_engine()
+    table = _file_record_table()
+    max_length = table.c.file_path.type.length
+    now = datetime.utcnow()
+    rows = []
+    for file_path, processed_at in records:
+        if max_length and len(file_path) > max_length:
+            logger.error(f"处理记录路径超过 {max_length} 个字符，跳过: {file_path[:100]}...")
+            continue
+        rows.append({"file_path": file_path, "processed_at": processed_at or now})
+    if not rows:
+        return 0
+    with engine.begin() as conn:
+        for i in range(0, len(rows), batch_size):
+            conn.execute(table.insert(), rows[i:i + batch_size])
+    return len(rows)
+
+
+class FileRecordWriter:
+    """
+    处理记录的后台写入器：请求线程只把记录放入有界队列，由写入线程攒批后调用
+    bulk_insert_file_records，避免逐条插入带来的大量数据库往返。
+    队列满时 submit 最多等待 FILE_RECORD_SUBMIT_TIMEOUT 秒，仍无法放入则丢弃并记录错误。
+    """
+
+    def __init__(self, batch_size: int = None, queue_size: int = None, flush_interval: float = None, engine=None):
+        self.batch_size = max(1, batch_size or Config.FILE_RECORD_BATCH_SIZE)
+        self.flush_interval = flush_interval if flush_interval is not None else Config.FILE_RECORD_FLUSH_INTERVAL
+        self.engine = engine
+        self._queue = queue.Queue(maxsize=queue_size or Config.FILE_RECORD_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="file-record-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, file_paths: list, processed_at: datetime = None) -> bool:
+        """
+        提交一批处理记录，立即返回。
+        :return: 全部放入队列返回 True，队列已满或写入器已关闭时返回 False
+        """
+        if self._closed:
+            return False
+        self._ensure_started()
+        processed_at = processed_at or datetime.utcnow()
+        for index, file_path in enumerate(file_paths):
+            try:
+                self._queue.put((file_path, processed_at), timeout=Config.FILE_RECORD_SUBMIT_TIMEOUT)
+            except queue.Full:
+                self.dropped += len(file_paths) - index
+                logger.error(f"处理记录写入队列已满，丢弃 {len(file_paths) - index} 条记录")
+                return False
+        return True
+
+    def _drain(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 留给主循环处理关闭
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(self._drain(item))
+
+    def _write(self, batch: list):
+        """写入一批记录；整批失败时逐条重试，只丢弃本身无法写入的记录"""
+        try:
+            written = bulk_insert_file_records(batch, self.batch_size, self.engine)
+        except Exception as e:
+            logger.warning(f"批量写入 {len(batch)} 条处理记录失败，逐条重试: {e}")
+            written = 0
+            for record in batch:
+                try:
+                    written += bulk_insert_file_records([record], self.batch_size, self.engine)
+                except Exception as e:
+                    logger.error(f"写入处理记录失败，丢弃 {record[0]}: {e}")
+        self.written += written
+        self.failed += len(batch) - written
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def close(self, timeout: float = None):
+        """停止接收新记录，等待队列中已有的记录写完"""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+
+
+# 全局处理记录写入器，写入线程在首次提交时启动
+file_record_writer = FileRecordWriter()
@@ -1,12 +1,31 @@
 from app.logger import get_logger
 import os
 
-from app.utils.trie import keyword_to_primary, trie
-from app.utils.yaml_loader import tag_data
+from app.config import Config
+from app.services.file_record_service import file_record_writer
+from app.services.tag_store import tag_store
+from app.utils.dir_walker import iter_files
+from app.utils.lru_cache import LRUCache
+from app.utils.rule_manager import RuleSet, rule_manager
+from app.utils.trie import KeywordTable
 
 # 获取日志记录器
 logger = get_logger()
 
+# 打标结果缓存，key 为 (path, 规则版本)
+mark_result_cache = LRUCache(Config.MARK_CACHE_SIZE, Config.MARK_CACHE_TTL) if Config.MARK_CACHE_SIZE else None
+
+
+def _clear_mark_result_cache(old_rules, new_rules):
+    """规则切换后旧版本的缓存结果全部失效"""
+    if mark_result_cache is not None:
+        logger.info(f"规则版本 {old_rules.version} -> {new_rules.version}，清空打标结果缓存: "
+                    f"{mark_result_cache.stats()}")
+        mark_result_cache.clear()
+
+
+rule_manager.add_listener(_clear_mark_result_cache)
+
 
 def process_file(file_path):
     """处理单个文件"""
@@ -15,17 +34,21 @@ def process_file(file_path):
     return f"Processed {file_path}"
 
 
-def process_files_in_folder(folder_path):
-    """处理文件夹中的所有文件"""
+def process_files_in_folder(folder_path, recursive=False, max_workers=None):
+    """
+    处理文件夹中的所有文件
+    :param recursive: 是否同时处理子目录中的文件
+    :param max_workers: 递归时并发扫描的目录数，默认 LOCAL_WALK_WORKERS
+    """
     if not os.path.isdir(folder_path):
         raise ValueError("Invalid folder path")
 
-    processed_files = []
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        if os.path.isfile(file_path):
-            result = process_file(file_path)
-            processed_files.append(result)
+    file_paths = [entry.path for entry in iter_files(folder_path, recursive=recursive, max_workers=max_workers)]
+    processed_files = [process_file(file_path) for file_path in file_paths]
+
+    if Config.FILE_RECORD_ON_PROCESS:
+        # 处理记录交给后台线程批量写入，不阻塞当前线程
+        file_record_writer.submit(file_paths)
 
     # 记录处理完成的信息
     logger.info(f"Completed processing files in folder: {folder_path}")
@@ -49,34 +72,36 @@ def process_message(message):
         return None
 
 
-def rename_files_in_folder(folder_path):
+def rename_files_in_folder(folder_path, recursive=False, max_workers=None):
     """
     将指定文件夹中的所有文件重命名为 1, 2, 3, 4, ... 等等。
     :param folder_path: 文件夹路径
+    :param recursive: 是否同时重命名子目录中的文件（每个目录内单独编号）
+    :param max_workers: 递归时并发扫描的目录数，默认 LOCAL_WALK_WORKERS
     :return: 返回操作结果信息
     """
     try:
-        # 获取文件夹中的所有文件
-        files = os.listdir(folder_path)
+        # 先完成扫描再重命名，避免边遍历边修改目录；按所在目录分组，每个目录内单独编号
+        files_by_dir = {}
+        for entry in iter_files(folder_path, recursive=recursive, max_workers=max_workers):
+            files_by_dir.setdefault(os.path.dirname(entry.path), []).append(entry.name)
 
-        # 排除非文件（如子文件夹）
-        files = [file for file in files if os.path.isfile(os.path.join(folder_path, file))]
+        for dir_path, files in files_by_dir.items():
+            # 按照数字重命名
+            for index, file in enumerate(files, start=1):
+                # 获取文件的扩展名
+                file_extension = os.path.splitext(file)[1]
 
-        # 按照数字重命名
-        for index, file in enumerate(files, start=1):
-            # 获取文件的扩展名
-            file_extension = os.path.splitext(file)[1]
+                # 新文件名
+                new_file_name = f"{index}{file_extension}"
 
-            # 新文件名
-            new_file_name = f"{index}{file_extension}"
+                # 获取原文件和新文件的完整路径
+                old_file_path = os.path.join(dir_path, file)
+                new_file_path = os.path.join(dir_path, new_file_name)
 
-            # 获取原文件和新文件的完整路径
-            old_file_path = os.path.join(folder_path, file)
-            new_file_path = os.path.join(folder_path, new_file_name)
-
-            # 重命名文件
-            os.rename(old_file_path, new_file_path)
-            logger.info(f"Renamed '{file}' to '{new_file_name}'")
+                # 重命名文件
+                os.rename(old_file_path, new_file_path)
+                logger.info(f"Renamed '{old_file_path}' to '{new_file_name}'")
 
         return {"status": "success", "message": "Files renamed successfully"}
 
@@ -99,7 +124,37 @@ def folder_exists(folder_path):
         return False
 
 
-def mark_file(path: str) -> str:
+def format_tags(matches, keywords: KeywordTable) -> str:
+    """
+    将自动机的匹配结果 [(start, end, word_id), ...]（已按出现位置排序）组装为标签字符串。
+    归一化关键词与一级标签均已在规则编译时预先计算为整数 ID，这里只做一次分组遍历。
+    """
+    norm_ids = keywords.norm_ids
+    primary_ids = keywords.primary_ids
+    labels = keywords.labels
+    # key: 一级标签 ID，value: [一级标签, 二级标签...]；字典按插入顺序即一级标签首次出现顺序
+    groups = {}
+    seen = set()
+    for _, _, word_id in matches:
+        norm_id = norm_ids[word_id]
+        # 归一化关键词唯一确定一级标签，出现过的关键词无需再处理
+        if norm_id in seen:
+            continue
+        seen.add(norm_id)
+        primary_id = primary_ids[word_id]
+        if primary_id < 0:
+            raise ValueError(f"关键词 '{labels[norm_id]}' 的一级标签无效")
+        group = groups.get(primary_id)
+        if group is None:
+            group = groups[primary_id] = [labels[primary_id]]
+        # 与一级标签相同的二级标签不重复显示
+        if norm_id != primary_id:
+            group.append(labels[norm_id])
+    # 如果有多个一级标签组，用分号分隔各组结果
+    return "; ".join(", ".join(group) for group in groups.values())
+
+
+def mark_file(path: str, rules: RuleSet = None) -> str:
     """
     对单个文件名进行打标：
     遍历 YAML 规则构造的 Trie，如果文件名中包含某个二级标签，
@@ -110,71 +165,99 @@ def mark_file(path: str) -> str:
     最后，将各组结果以分号分隔返回，例如：
       "失效, 跳水, 问题; 培训, 课件"
     如果处理过程中出现错误，则返回空字符串。
+    :param rules: 使用的规则快照，默认取当前生效的规则
     """
     try:
-        # 在文件名中搜索所有匹配的关键词，返回 (index, keyword) 列表
-        matches = trie.search_in_text(path)
-        if not matches:
-            return ""
-        # 记录每个匹配的关键词及其归一化后的结果
-        occurrences = []
-        for index, keyword in matches:
-            norm_keyword = keyword.strip().lower()  # 归一化
-            occurrences.append((index, norm_keyword))
-        # 按出现位置排序
-        occurrences.sort(key=lambda x: x[0])
-
-        # 根据归一化关键词查找对应的一级标签，并分组存储
-        groups = {}  # key: primary, value: list of secondary keywords (按首次出现顺序，不重复)
-        for pos, norm_keyword in occurrences:
-            # 查找一级标签，注意在构建 keyword_to_primary 时要确保关键词也归一化
-            primary = keyword_to_primary.get(norm_keyword, "").strip()
-            if primary == "":
-                # 如果映射中没有一级标签，则以自身作为一级标签
-                primary = norm_keyword
-            # 如果该一级标签组不存在，创建一个空列表
-            if primary not in groups:
-                groups[primary] = []
-            # 如果当前关键词尚未加入该组，则添加
-            if norm_keyword not in groups[primary]:
-                groups[primary].append(norm_keyword)
-
-        # 为了保证整体顺序与文件名中出现顺序一致，我们根据每个一级标签第一次出现的位置进行排序
-        primary_order = []
-        seen_primary = set()
-        for pos, norm_keyword in occurrences:
-            primary = keyword_to_primary.get(norm_keyword, "").strip()
-            if primary == "":
-                primary = norm_keyword
-            if primary not in seen_primary:
-                seen_primary.add(primary)
-                primary_order.append(primary)
-
-        # 构造最终结果字符串：
-        # 对于每个一级标签，只输出一次，然后附上该组中不等于一级标签的二级标签
-        result_parts = []
-        for primary in primary_order:
-            secondaries = groups.get(primary, [])
-            # 过滤掉与 primary 相同的二级标签（只保留一个 primary）
-            group_tags = [primary] + [sec for sec in secondaries if sec != primary]
-            result_parts.append(", ".join(group_tags))
-
-        # 如果有多个一级标签组，可以用分号分隔各组结果
-        result = "; ".join(result_parts)
-        return result
+        if rules is None:
+            rules = rule_manager.current()
+        return _tag_path(path, rules)
     except Exception as e:
         logger.error(f"错误处理文件 '{path}': {e}")
         return ""
 
 
-def mark_files(file_list: list) -> list[str]:
+def _tag_path(path: str, rules: RuleSet) -> str:
+    """对单个路径整段扫描打标，出错时抛出异常"""
+    # 在文件名中搜索所有匹配的关键词，返回按出现位置排序的 (start, end, word_id) 列表
+    matches = rules.trie.search_ids(path)
+    if not matches:
+        return ""
+    return format_tags(matches, rules.keywords)
+
+
+class SegmentMarker:
+    """
+    批量打标器：将路径拆分为目录前缀（含末尾 '/'）和文件名两段，
+    同一批次中相同的目录和文件名只扫描一次，再按顺序拼接两段的匹配结果。
+    关键词不含 '/' 时，任何匹配都不会跨越最后一个分隔符，拼接结果与整段扫描完全一致；
+    否则退回整段扫描。打标出错时抛出异常，由调用方按单个文件处理。
+    """
+
+    def __init__(self, rules: RuleSet):
+        self.rules = rules
+        self.splittable = not rules.keywords.has_separator
+        self._segments = {}  # 路径片段 -> 匹配结果
+
+    def _scan(self, segment: str):
+        matches = self._segments.get(segment)
+        if matches is None:
+            matches = self._segments[segment] = self.rules.trie.search_ids(segment)
+        return matches
+
+    def mark(self, path: str) -> str:
+        if not self.splittable:
+            return _tag_path(path, self.rules)
+        pos = path.rfind('/') + 1
+        # 目录段的匹配全部位于文件名段之前，直接拼接即保持出现顺序
+        matches = self._scan(path[:pos]) + self._scan(path[pos:]) if pos else self._scan(path)
+        if not matches:
+            return ""
+        return format_tags(matches, self.rules.keywords)
+
+
+def mark_file_cached(path: str, rules: RuleSet = None, marker: SegmentMarker = None) -> str:
+    """
+    带结果缓存的 mark_file，缓存 key 为 (path, 规则版本)，未启用缓存时直接打标。
+    打标出错时抛出异常，出错的结果不写入缓存。
+    :param marker: 批量打标器，传入时通过它打标以复用同批次的片段扫描结果
+    """
+    if rules is None:
+        rules = rule_manager.current()
+    if mark_result_cache is None:
+        return marker.mark(path) if marker is not None else _tag_path(path, rules)
+    key = (path, rules.version)
+    tag_result = mark_result_cache.get(key)
+    if tag_result is None:
+        tag_result = marker.mark(path) if marker is not None else _tag_path(path, rules)
+        mark_result_cache.put(key, tag_result)
+    return tag_result
+
+
+def mark_files(file_list: list, persist: bool = True) -> list[str]:
     """
     对传入的文件列表进行打标。
 
     :param file_list: 文件列表，每个元素为字典，至少包含 'path' 和 'dir' 键
+    :param persist: 是否使用打标结果存储：带 neid 和 rev 的文件复用已保存的结果，新结果写回存储
     :return: 返回一个打标结果的列表（仅对非目录文件进行打标），顺序与输入顺序一致；
              对于文件夹则返回空字符串。
     """
+    # 整批使用同一份规则快照，规则热更新不会在批次中途生效
+    rules = rule_manager.current()
+    if persist and tag_store.enabled:
+        return tag_store.mark_incremental(
+            file_list, rules.checksum, lambda files: mark_file_list(files, rules, error_value=None)
+        )
+    return mark_file_list(file_list, rules)
+
+
+def mark_file_list(file_list: list, rules: RuleSet, error_value="") -> list:
+    """
+    使用指定的规则快照对文件列表打标，不经过打标结果存储
+    :param error_value: 处理出错的文件对应的结果，默认空字符串；增量打标传入 None 以区分出错和没有匹配
+    """
+    # 批量模式：相同的目录前缀和文件名在本批次内只扫描一次
+    marker = SegmentMarker(rules) if Config.MARK_BATCH_DEDUP else None
     results = []
     for file_item in file_list:
         try:
@@ -182,12 +265,12 @@ def mark_files(file_list: list) -> list[str]:
                 file_path = file_item.get("path")
                 if file_path is None:
                     raise ValueError("path参数没有找到")
-                tag_result = mark_file(file_path)
+                tag_result = mark_file_cached(file_path, rules, marker)
                 results.append(tag_result)
             else:
                 results.append("")
         except Exception as e:
             logger.error(f"错误处理 {file_item}文件: {e}")
-            results.append("")
+            results.append(error_value)
     return results
 
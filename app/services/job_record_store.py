@@ -0,0 +1,143 @@
+import json
+
+from sqlalchemy import func
+
+from app.config import Config
+from app.logger import get_logger
+from app.utils.db_engine import get_db_engine
+
+# 获取日志记录器
+logger = get_logger()
+
+# 与 job_service 中的任务状态一致
+_PENDING = "pending"
+_FAILED = "failed"
+
+
+class JobRecordStore:
+    """
+    异步打标任务的数据库存储：gunicorn 多个工作进程各自持有内存中的任务，
+    任务状态和结果同时写入数据库，查询请求落到其他工作进程时从这里读取。
+    """
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = max(1, batch_size or Config.MARK_JOB_RESULT_BATCH_SIZE)
+        self._jobs = None
+        self._results = None
+
+    def _engine(self):
+        if self._jobs is None:
+            from app.models.file_model import MarkJobRecord, MarkJobResult
+            self._jobs = MarkJobRecord.__table__
+            self._results = MarkJobResult.__table__
+        return get_db_engine(self._jobs, self._results)
+
+    @staticmethod
+    def _row(job) -> dict:
+        return {
+            "status": job.status,
+            "total": job.total,
+            "processed": job.processed,
+            "result_count": job.result_count,
+            "finished_at": job.finished_at,
+            "error": job.error,
+            "stats": json.dumps(job.stats, ensure_ascii=False) if job.stats is not None else None,
+        }
+
+    def insert(self, job):
+        engine = self._engine()
+        with engine.begin() as conn:
+            conn.execute(self._jobs.insert(), [dict(self._row(job), job_id=job.job_id, created_at=job.created_at,
+                                                    timeout=job.timeout)])
+
+    def update(self, job):
+        """写入任务状态；任务成功时先写入结果，再更新状态，其他进程看到成功时结果已经完整"""
+        engine = self._engine()
+        with engine.begin() as conn:
+            if job.result is not None:
+                conn.execute(self._results.delete().where(self._results.c.job_id == job.job_id))
+                rows = [{"job_id": job.job_id, "seq": seq, "data": json.dumps(item, ensure_ascii=False)}
+                        for seq, item in enumerate(job.result)]
+                for i in range(0, len(rows), self.batch_size):
+                    conn.execute(self._results.insert(), rows[i:i + self.batch_size])
+            conn.execute(self._jobs.update().where(self._jobs.c.job_id == job.job_id).values(**self._row(job)))
+
+    def append_results(self, job_id: str, start: int, items: list):
+        """追加写入运行中任务的一页结果，start 为第一条结果的序号"""
+        engine = self._engine()
+        rows = [{"job_id": job_id, "seq": start + offset, "data": json.dumps(item, ensure_ascii=False)}
+                for offset, item in enumerate(items)]
+        with engine.begin() as conn:
+            for i in range(0, len(rows), self.batch_size):
+                conn.execute(self._results.insert(), rows[i:i + self.batch_size])
+
+    def update_progress(self, job_id: str, total: int, processed: int):
+        """写入运行中任务的进度，任务已结束时不覆盖"""
+        engine = self._engine()
+        table = self._jobs
+        with engine.begin() as conn:
+            conn.execute(table.update()
+                         .where(table.c.job_id == job_id).where(table.c.status == _PENDING)
+                         .values(total=total, processed=processed))
+
+    def load(self, job_id: str, job_class):
+        """读取任务状态（不含结果），不存在时返回 None"""
+        engine = self._engine()
+        table = self._jobs
+        with engine.connect() as conn:
+            row = conn.execute(table.select().where(table.c.job_id == job_id)).mappings().first()
+        if row is None:
+            return None
+        return job_class(
+            job_id=row["job_id"], status=row["status"], total=row["total"], processed=row["processed"],
+            result_count=row["result_count"], created_at=row["created_at"], finished_at=row["finished_at"],
+            timeout=row["timeout"], error=row["error"],
+            stats=json.loads(row["stats"]) if row["stats"] is not None else None,
+        )
+
+    def result_page(self, job_id: str, start: int, size: int) -> list:
+        engine = self._engine()
+        table = self._results
+        with engine.connect() as conn:
+            rows = conn.execute(
+                table.select().with_only_columns(table.c.data)
+                .where(table.c.job_id == job_id)
+                .where(table.c.seq >= start).where(table.c.seq < start + size)
+                .order_by(table.c.seq)
+            )
+            return [json.loads(data) for data, in rows]
+
+    def fail_timed_out(self, job_id: str, error: str, finished_at: float):
+        """把仍未完成的任务标记为失败（其他进程发现任务超时时调用）"""
+        engine = self._engine()
+        table = self._jobs
+        with engine.begin() as conn:
+            conn.execute(table.update()
+                         .where(table.c.job_id == job_id).where(table.c.status == _PENDING)
+                         .values(status=_FAILED, error=error, finished_at=finished_at))
+
+    def purge(self, now: float, ttl: float, default_timeout: float, error: str):
+        """
+        清理数据库中的任务：超时仍未完成的任务（所属进程可能已退出）标记为失败，
+        结束超过 ttl 秒的任务连同结果一起删除。
+        """
+        engine = self._engine()
+        jobs, results = self._jobs, self._results
+        with engine.begin() as conn:
+            conn.execute(jobs.update()
+                         .where(jobs.c.status == _PENDING)
+                         .where(jobs.c.created_at + func.coalesce(jobs.c.timeout, default_timeout) < now)
+                         .values(status=_FAILED, error=error, finished_at=now))
+            job_ids = [job_id for job_id, in conn.execute(
+                jobs.select().with_only_columns(jobs.c.job_id).where(jobs.c.finished_at < now - ttl)
+            )]
+            for i in range(0, len(job_ids), self.batch_size):
+                batch = job_ids[i:i + self.batch_size]
+                conn.execute(results.delete().where(results.c.job_id.in_(batch)))
+                conn.execute(jobs.delete().where(jobs.c.job_id.in_(batch)))
+        if job_ids:
+            logger.info(f"已删除过期的打标任务 {len(job_ids)} 个")
+
+
+# 全局任务数据库存储
+job_record_store = JobRecordStore()
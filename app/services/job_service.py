@@ -0,0 +1,355 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.job_record_store import job_record_store
+from app.services.mark_dispatcher import iter_mark_results, mark_files_remote
+from app.services.namespace_walker import NamespaceWalker, iter_batches
+from app.services.sync_service import CHANGE_DELETED, SnapshotDiff, snapshot_store
+
+# 获取日志记录器
+logger = get_logger()
+
+JOB_PENDING = "pending"
+JOB_SUCCESS = "success"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class MarkJob:
+    """异步打标任务"""
+    job_id: str
+    total: int = 0
+    status: str = JOB_PENDING
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    processed: int = 0  # 已完成打标的文件数（遍历任务的进度）
+    timeout: Optional[float] = None  # 任务自身的超时时间，为空时使用 JobStore 的设置
+    stats: Optional[dict] = None  # 遍历统计信息
+    result_count: Optional[int] = None  # 成功完成后的结果条数（从数据库读取的任务不含 result）
+
+    def summary(self) -> dict:
+        """任务状态信息（不含结果数据）"""
+        summary = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if self.stats is not None:
+            summary["stats"] = self.stats
+        return summary
+
+
+class JobStore:
+    """
+    有界的异步任务存储：未完成的任务超过自身的 timeout 秒视为失败，已结束的任务在结束 ttl 秒后删除；
+    任务数超过 max_jobs 时按结束时间淘汰最早结束的任务，未完成的任务不会被淘汰。
+    指定 record_store 时任务状态和结果同时写入数据库：提交任务的进程在内存中执行任务，
+    查询请求落到其他进程（gunicorn 多个工作进程）时从数据库读取。未指定时只能单进程部署。
+    """
+
+    _TIMEOUT_ERROR = "打标任务处理超时"
+
+    def __init__(self, max_jobs: int = None, ttl: float = None, timeout: float = None, record_store=None):
+        self.max_jobs = max_jobs if max_jobs is not None else Config.MARK_JOB_MAX_JOBS
+        self.ttl = ttl if ttl is not None else Config.MARK_JOB_TTL
+        self.timeout = timeout if timeout is not None else Config.MARK_JOB_TIMEOUT
+        self.record_store = record_store
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._progress_saved_at = {}  # job_id -> 上次写入进度的时间
+        self._purged_at = 0.0  # 上次清理数据库的时间
+        # 数据库写入在单个后台线程中按提交顺序执行，不阻塞请求线程和 RPC 回调线程
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store") if record_store else None
+
+    def _persist(self, action: str, func, *args):
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"异步打标任务{action}写入数据库失败: {e}")
+
+        self._writer.submit(run)
+
+    def _purge(self):
+        now = time.time()
+        finished = []
+        for job in self._jobs.values():
+            timeout = job.timeout if job.timeout is not None else self.timeout
+            if job.status == JOB_PENDING and now - job.created_at > timeout:
+                self.fail(job, self._TIMEOUT_ERROR)
+            if job.status != JOB_PENDING:
+                finished.append(job)
+        finished.sort(key=lambda job: job.finished_at)
+        overflow = len(self._jobs) - self.max_jobs
+        for job in finished:
+            if overflow <= 0 and now - job.finished_at <= self.ttl:
+                break
+            del self._jobs[job.job_id]
+            overflow -= 1
+        if self.record_store is not None and now - self._purged_at >= Config.MARK_JOB_PURGE_INTERVAL:
+            self._purged_at = now
+            self._persist("清理", self.record_store.purge, now, self.ttl, self.timeout, self._TIMEOUT_ERROR)
+
+    def create(self, total: int = 0, timeout: float = None) -> MarkJob:
+        job = MarkJob(job_id=uuid.uuid4().hex, total=total, timeout=timeout)
+        if self.record_store is not None:
+            # 同步写入，任务 ID 返回给调用方时其他进程已经可以查到
+            try:
+                self.record_store.insert(job)
+            except Exception as e:
+                logger.error(f"异步打标任务 {job.job_id} 写入数据库失败，只能在当前进程查询: {e}")
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._purge()
+        return job
+
+    def get(self, job_id: str) -> Optional[MarkJob]:
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+        if job is not None or self.record_store is None:
+            return job
+        # 任务由其他进程提交
+        try:
+            job = self.record_store.load(job_id, MarkJob)
+        except Exception as e:
+            logger.error(f"读取异步打标任务 {job_id} 失败: {e}")
+            return None
+        if job is None:
+            return None
+        timeout = job.timeout if job.timeout is not None else self.timeout
+        if job.status == JOB_PENDING and time.time() - job.created_at > timeout:
+            job.status, job.error, job.finished_at = JOB_FAILED, self._TIMEOUT_ERROR, time.time()
+            self._persist("超时", self.record_store.fail_timed_out, job.job_id, job.error, job.finished_at)
+        if job.finished_at is not None and time.time() - job.finished_at > self.ttl:
+            return None
+        return job
+
+    def result_page(self, job: MarkJob, start: int, size: int) -> tuple[int, list]:
+        """分页读取已成功任务的结果，返回 (结果总数, 本页结果)"""
+        if job.result is not None:
+            return len(job.result), job.result[start:start + size]
+        return job.result_count or 0, self.record_store.result_page(job.job_id, start, size)
+
+    def update_progress(self, job: MarkJob):
+        """写入运行中任务的进度（total、processed），每个任务最多每 MARK_JOB_PROGRESS_INTERVAL 秒写一次"""
+        if self.record_store is None or job.status != JOB_PENDING:
+            return
+        now = time.monotonic()
+        if now - self._progress_saved_at.get(job.job_id, 0.0) < Config.MARK_JOB_PROGRESS_INTERVAL:
+            return
+        self._progress_saved_at[job.job_id] = now
+        self._persist("进度", self.record_store.update_progress, job.job_id, job.total, job.processed)
+
+    def _finish(self, job: MarkJob):
+        self._progress_saved_at.pop(job.job_id, None)
+        if self.record_store is not None:
+            self._persist("结果", self.record_store.update, job)
+
+    def complete(self, job: MarkJob, result, result_count: int = None):
+        """
+        :param result: 任务结果；结果已经由 JobResults 分页写入数据库时为 None
+        :param result_count: result 为 None 时的结果条数
+        """
+        if job.status != JOB_PENDING:
+            return
+        job.result = result
+        job.result_count = len(result) if result is not None else result_count
+        job.processed = job.result_count
+        job.finished_at = time.time()
+        job.status = JOB_SUCCESS
+        self._finish(job)
+
+    def fail(self, job: MarkJob, error: str):
+        if job.status != JOB_PENDING:
+            return
+        job.error = error
+        job.finished_at = time.time()
+        job.status = JOB_FAILED
+        self._finish(job)
+
+
+class JobResults:
+    """
+    运行中的遍历、同步任务逐条产生的结果。启用数据库存储时每满 MARK_JOB_RESULT_BATCH_SIZE 条
+    写入一页，内存中只保留尚未写入的部分；未启用时结果全部保留在内存中，完成时一并交给 JobStore。
+    写入失败时抛出异常，由任务按处理出错失败。
+    """
+
+    def __init__(self, store: JobStore, job: MarkJob):
+        self.store = store
+        self.job = job
+        self.count = 0
+        self._pending = []
+        self._streaming = store.record_store is not None
+
+    def append(self, item):
+        self._pending.append(item)
+        self.count += 1
+        if self._streaming and len(self._pending) >= Config.MARK_JOB_RESULT_BATCH_SIZE:
+            self._flush()
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def _flush(self):
+        if self._pending:
+            self.store.record_store.append_results(self.job.job_id, self.count - len(self._pending), self._pending)
+            self._pending = []
+
+    def complete(self):
+        if self._streaming:
+            # 最后一页写入后再更新任务状态，其他进程看到成功时结果已经完整
+            self._flush()
+            self.store.complete(self.job, None, self.count)
+        else:
+            self.store.complete(self.job, self._pending)
+
+
+# 全局异步打标任务存储
+job_store = JobStore(record_store=job_record_store if Config.MARK_JOB_SHARED_STORE else None)
+
+
+def submit_mark_job(file_list: list) -> MarkJob:
+    """
+    以异步方式提交打标任务：发送 RPC 请求后立即返回任务，全部分片完成时由回调写入结果。
+    """
+    job = job_store.create(total=len(file_list))
+
+    def on_done(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"异步打标任务 {job.job_id} 处理出错: {e}")
+            job_store.fail(job, str(e))
+            return
+        job_store.complete(job, result)
+        logger.info(f"异步打标任务 {job.job_id} 完成，共 {len(result)} 条")
+
+    mark_files_remote(file_list, timeout=job_store.timeout).add_done_callback(on_done)
+    return job
+
+
+def submit_walk_job(params: dict, max_depth: int = None, max_files: int = None, slug: str = None) -> MarkJob:
+    """
+    提交目录树打标任务：后台线程递归遍历目录，发现的文件按批次直接送入打标，
+    遍历和打标同时进行。任务的 total 随遍历增长，processed 为已完成打标的文件数。
+    :param params: 根目录的请求参数（path、path_type、sort、order_by）
+    :param slug: 代表调用的用户登录名，默认 EXTERNAL_OAUTH_SLUG
+    """
+    job = job_store.create(timeout=Config.WALK_JOB_TIMEOUT)
+    walker = NamespaceWalker(params, max_depth=max_depth, max_files=max_files, slug=slug)
+
+    def counted_batches():
+        for batch in iter_batches(walker, Config.WALK_MARK_BATCH_SIZE):
+            job.total += len(batch)
+            job_store.update_progress(job)
+            yield batch
+
+    def run():
+        results = JobResults(job_store, job)
+        try:
+            for item in iter_mark_results(counted_batches(), Config.WALK_MARK_MAX_INFLIGHT, Config.RPC_TIMEOUT):
+                results.append(item)
+                job.processed += 1
+                job_store.update_progress(job)
+                if job.status != JOB_PENDING:
+                    # 任务已超时，停止遍历
+                    return
+            job.stats = walker.stats()
+            results.complete()
+        except Exception as e:
+            logger.error(f"目录打标任务 {job.job_id} 处理出错: {e}")
+            job.stats = walker.stats()
+            job_store.fail(job, str(e))
+            return
+        logger.info(f"目录打标任务 {job.job_id} 完成，共 {results.count} 条，{job.stats['folders_listed']} 个目录")
+
+    threading.Thread(target=run, name=f"walk-job-{job.job_id[:8]}", daemon=True).start()
+    return job
+
+
+def submit_sync_job(params: dict, nsid: int = None, max_depth: int = None, max_files: int = None,
+                    slug: str = None) -> MarkJob:
+    """
+    提交增量同步任务：遍历目录树并与上次同步的快照比较，只对新增和变化（rev 或路径不同）的文件打标，
+    每批打标成功后更新快照。遍历完整结束（未截断、没有目录读取失败）时报告并删除已不存在的文件，
+    否则本次不处理删除，避免把未遍历到的文件误判为已删除。
+    任务结果为 [{"neid", "path", "change", "tag"}]，change 为 added、changed 或 deleted。
+    :param params: 根目录的请求参数（path、path_type、sort、order_by）
+    :param nsid: 命名空间 ID，为空时使用该路径下所有命名空间的快照
+    """
+    job = job_store.create(timeout=Config.WALK_JOB_TIMEOUT)
+    root_path = params.get("path")
+    walker = NamespaceWalker(params, max_depth=max_depth, max_files=max_files, slug=slug)
+
+    def run():
+        try:
+            diff = SnapshotDiff(snapshot_store.load(root_path, nsid))
+        except Exception as e:
+            logger.error(f"增量同步任务 {job.job_id} 读取快照失败: {e}")
+            job_store.fail(job, f"读取快照失败: {e}")
+            return
+        items = walker if nsid is None else (item for item in walker if item.get("nsid") == nsid)
+        produced = deque()  # 已送去打标、尚未全部返回结果的批次
+
+        def change_batches():
+            for batch in iter_batches(diff.filter_changes(items), Config.WALK_MARK_BATCH_SIZE):
+                produced.append(batch)
+                job.total += len(batch)
+                yield [item for _, item in batch]
+
+        results = JobResults(job_store, job)
+        batch_marked = []  # 当前批次已返回的打标结果
+        try:
+            for marked in iter_mark_results(change_batches(), Config.WALK_MARK_MAX_INFLIGHT, Config.RPC_TIMEOUT):
+                change, item = produced[0][len(batch_marked)]
+                results.append({"neid": item.get("neid"), "path": item.get("path"), "change": change,
+                                "tag": marked.get("tag")})
+                batch_marked.append(marked)
+                job.processed += 1
+                job_store.update_progress(job)
+                if len(batch_marked) == len(produced[0]):
+                    # 打标失败的文件不写入快照，下次同步时重新打标
+                    snapshot_store.upsert(root_path, [
+                        entry for (_, entry), result in zip(produced.popleft(), batch_marked)
+                        if "error" not in result
+                    ])
+                    batch_marked = []
+                if job.status != JOB_PENDING:
+                    return
+            stats = dict(walker.stats(), **diff.stats())
+            if walker.truncated or walker.errors:
+                stats["deleted"] = None
+                logger.warning(f"增量同步任务 {job.job_id} 遍历不完整，本次不处理删除")
+            else:
+                deleted = diff.deleted()
+                snapshot_store.delete(root_path, [(del_nsid, neid) for del_nsid, neid, _ in deleted])
+                results.extend({"neid": neid, "path": path, "change": CHANGE_DELETED, "tag": None}
+                               for _, neid, path in deleted)
+                stats["deleted"] = len(deleted)
+            job.stats = stats
+            results.complete()
+        except Exception as e:
+            logger.error(f"增量同步任务 {job.job_id} 处理出错: {e}")
+            job.stats = dict(walker.stats(), **diff.stats())
+            job_store.fail(job, str(e))
+            return
+        logger.info(f"增量同步任务 {job.job_id} 完成: {stats}")
+
+    threading.Thread(target=run, name=f"sync-job-{job.job_id[:8]}", daemon=True).start()
+    return job
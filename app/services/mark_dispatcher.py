@@ -0,0 +1,184 @@
+import json
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.rabbitmq_service import rabbitmq_rpc
+from app.utils.wire_format import (
+    COMPACT, FORMAT_HEADER, decode_payload, encode_payload, project_files, wire_negotiator
+)
+
+# 获取日志记录器
+logger = get_logger()
+
+FAILURE_POLICY_FAIL = "fail"  # 任一分片失败则整批失败
+FAILURE_POLICY_PARTIAL = "partial"  # 失败分片的文件返回空标签和错误信息，其余分片正常返回
+
+# 分片重试和旧格式重发在这里执行：RPC 回调运行在连接的 I/O 线程中，不能在其中获取连接或等待连接检查
+_resend_executor = ThreadPoolExecutor(max_workers=Config.MARK_RESEND_THREADS, thread_name_prefix="mark-resend")
+
+
+class MarkBatch:
+    """
+    一次打标请求的分片发送与结果重组。
+    大列表按 chunk_size 拆分为多条 RPC 消息（携带相同的 batch_id 和分片序号），
+    由多个消费者并行处理，全部分片完成后按序号拼接结果。
+    结果回调在 RPC 客户端的 I/O 线程中执行，重发分片交给 _resend_executor。
+    """
+
+    def __init__(self, file_list: list, chunk_size: int, timeout: float = None,
+                 failure_policy: str = FAILURE_POLICY_FAIL, retries: int = 0):
+        self.batch_id = uuid.uuid4().hex
+        self.file_list = file_list
+        self.chunks = [file_list[i:i + chunk_size] for i in range(0, len(file_list), chunk_size)] or [[]]
+        self.timeout = timeout
+        self.failure_policy = failure_policy
+        self.retries = retries
+        self.future = Future()
+        self._results = [None] * len(self.chunks)
+        self._errors = {}
+        self._attempts = [0] * len(self.chunks)
+        self._remaining = len(self.chunks)
+        self._lock = threading.Lock()
+
+    def _message(self, seq: int, compact: bool = False) -> dict:
+        if compact:
+            # 紧凑格式只携带消费者需要的字段
+            task_message = {"task_type": "mark_files", "files": project_files(self.chunks[seq])}
+        else:
+            task_message = {"task_type": "mark_files", "fileModelList": self.chunks[seq]}
+        if len(self.chunks) > 1:
+            task_message.update({"batch_id": self.batch_id, "seq": seq, "chunks": len(self.chunks)})
+        return task_message
+
+    def start(self) -> Future:
+        for seq in range(len(self.chunks)):
+            self._send(seq)
+        return self.future
+
+    def _send(self, seq: int, legacy: bool = False):
+        """
+        发送一个分片。
+        :param legacy: 为 True 时强制使用旧格式（紧凑格式请求被旧版消费者处理后重发），不计入重试次数
+        """
+        if not legacy:
+            self._attempts[seq] += 1
+        try:
+            content_type = None if legacy else wire_negotiator.request_content_type()
+            if content_type:
+                body, content_encoding = encode_payload(self._message(seq, compact=True), content_type)
+                rpc_future = rabbitmq_rpc.call_async(
+                    body, self.timeout, headers={FORMAT_HEADER: COMPACT},
+                    content_type=content_type, content_encoding=content_encoding, raw=True
+                )
+            else:
+                rpc_future = rabbitmq_rpc.call_async(
+                    json.dumps(self._message(seq)), self.timeout,
+                    headers=wire_negotiator.request_headers(), raw=True
+                )
+        except Exception as e:
+            self._on_chunk_done(seq, None, e)
+            return
+        compact = content_type is not None
+        rpc_future.add_done_callback(lambda f: self._on_rpc_done(seq, f, compact))
+
+    def _on_rpc_done(self, seq: int, rpc_future: Future, compact: bool = False):
+        try:
+            body, properties = rpc_future.result()
+            if compact and (properties.headers or {}).get(FORMAT_HEADER) != COMPACT:
+                # 旧版消费者无法解析紧凑格式，回复的是旧格式的错误或无效结果，改用旧格式重发
+                wire_negotiator.observe_reply(properties.headers)
+                logger.warning(f"打标批次 {self.batch_id} 分片 {seq} 被不支持紧凑格式的消费者处理，使用旧格式重发")
+                _resend_executor.submit(self._send, seq, True)
+                return
+            result = self._parse_reply(seq, body, properties)
+            if len(result) != len(self.chunks[seq]):
+                raise RuntimeError("打标结果数量不匹配")
+        except Exception as e:
+            self._on_chunk_done(seq, None, e)
+            return
+        self._on_chunk_done(seq, result, None)
+
+    def _parse_reply(self, seq: int, body: bytes, properties) -> list:
+        headers = properties.headers or {}
+        wire_negotiator.observe_reply(headers)
+        if headers.get(FORMAT_HEADER) == COMPACT:
+            reply = decode_payload(body, properties.content_type, properties.content_encoding)
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            tags = reply["tags"]
+            if len(tags) != len(self.chunks[seq]):
+                raise RuntimeError("打标结果数量不匹配")
+            return [{"neid": item.get("neid"), "tag": tag} for item, tag in zip(self.chunks[seq], tags)]
+        result = json.loads(body.decode('utf-8'))
+        if isinstance(result, dict) and "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    def _on_chunk_done(self, seq: int, result, error):
+        if error is not None and self._attempts[seq] <= self.retries and not self.future.done():
+            logger.warning(f"打标批次 {self.batch_id} 分片 {seq} 失败，重试: {error}")
+            _resend_executor.submit(self._send, seq)
+            return
+        with self._lock:
+            if error is not None:
+                self._errors[seq] = str(error)
+                logger.error(f"打标批次 {self.batch_id} 分片 {seq} 失败: {error}")
+            else:
+                self._results[seq] = result
+            self._remaining -= 1
+            finished = self._remaining == 0
+            fail_fast = error is not None and self.failure_policy == FAILURE_POLICY_FAIL
+        if fail_fast:
+            if not self.future.done():
+                self.future.set_exception(RuntimeError(f"打标分片 {seq} 处理失败: {error}"))
+        elif finished and not self.future.done():
+            self.future.set_result(self._assemble())
+
+    def _assemble(self) -> list:
+        merged = []
+        for seq, chunk in enumerate(self.chunks):
+            if seq in self._errors:
+                merged.extend({"neid": item.get("neid"), "tag": "", "error": self._errors[seq]} for item in chunk)
+            else:
+                merged.extend(self._results[seq])
+        return merged
+
+
+def mark_files_remote(file_list: list, timeout: float = None) -> Future:
+    """
+    通过 RPC 对文件列表打标，大列表拆分为多个分片并行发送。
+    返回的 Future 结果为 [{"neid": ..., "tag": ...}, ...]，顺序与输入一致。
+    """
+    batch = MarkBatch(
+        file_list,
+        chunk_size=max(1, Config.MARK_FANOUT_CHUNK_SIZE),
+        timeout=timeout,
+        failure_policy=Config.MARK_FANOUT_FAILURE_POLICY,
+        retries=Config.MARK_FANOUT_RETRIES,
+    )
+    if len(batch.chunks) > 1:
+        logger.info(f"打标批次 {batch.batch_id}: {len(file_list)} 个文件拆分为 {len(batch.chunks)} 个分片")
+    return batch.start()
+
+
+def iter_mark_results(batches, max_inflight: int, timeout: float = None):
+    """
+    对逐批产生的文件列表打标，逐条产出 {"neid": ..., "tag": ...}，顺序与输入一致。
+    同时在途的批次数不超过 max_inflight，上游产生数据的速度受打标进度约束。
+    :param batches: 可迭代的文件列表批次，可以是生成器
+    :param timeout: 每批 RPC 的超时时间（秒）
+    """
+    max_inflight = max(1, max_inflight)
+    inflight = deque()
+    for batch in batches:
+        if not batch:
+            continue
+        inflight.append(mark_files_remote(batch, timeout=timeout))
+        while len(inflight) >= max_inflight:
+            yield from inflight.popleft().result(timeout=timeout)
+    while inflight:
+        yield from inflight.popleft().result(timeout=timeout)
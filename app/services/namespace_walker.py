@@ -0,0 +1,161 @@
+import queue
+import threading
+from collections import namedtuple
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.external_file_service import iter_file_list
+
+# 获取日志记录器
+logger = get_logger()
+
+_DONE = object()  # 全部目录遍历完成
+_STOP = (None, None)  # 通知工作线程退出
+
+# 目录遍历完成事件：该目录的文件都已在此事件之前产出，children 为其子目录路径
+FolderDone = namedtuple("FolderDone", ["path", "children"])
+
+
+class NamespaceWalker:
+    """
+    通过外部文件列表接口递归遍历目录树，逐个产出文件（不含目录）。
+    待遍历的目录放入工作队列，由 workers 个线程并发分页读取；发现的文件放入有界队列，
+    调用方消费得慢时工作线程阻塞等待，不会无限制地提前拉取。
+    :param params: 根目录的请求参数（path、path_type、sort、order_by）
+    :param max_depth: 最大遍历深度，根目录为 0，超过深度的子目录不再进入
+    :param max_files: 最多产出的文件数，达到后停止遍历，0 表示不限
+    :param workers: 并发遍历的目录数
+    :param page_workers: 单个目录分页读取的并发数
+    :param slug: 代表调用的用户登录名，用于获取 token，默认 EXTERNAL_OAUTH_SLUG
+    :param completed_folders: 已完成的目录 {路径: [子目录路径]}（断点续跑），这些目录不再读取，直接进入其子目录
+    :param emit_folder_events: 为 True 时在每个目录读取完成后额外产出一个 FolderDone
+    """
+
+    def __init__(self, params: dict, max_depth: int = None, max_files: int = None,
+                 workers: int = None, page_workers: int = None, queue_size: int = None, slug: str = None,
+                 completed_folders: dict = None, emit_folder_events: bool = False):
+        self.params = params
+        self.slug = slug
+        self.completed_folders = completed_folders or {}
+        self.emit_folder_events = emit_folder_events
+        self.max_depth = max_depth if max_depth is not None else Config.WALK_MAX_DEPTH
+        self.max_files = max_files if max_files is not None else Config.WALK_MAX_FILES
+        self.workers = max(1, workers or Config.WALK_WORKERS)
+        self.page_workers = max(1, page_workers or Config.WALK_PAGE_WORKERS)
+        self.queue_size = queue_size or Config.WALK_QUEUE_SIZE
+        self.folders_listed = 0
+        self.folders_skipped = 0  # 超过最大深度未进入的目录数
+        self.files_found = 0
+        self.truncated = False  # 是否因达到 max_files 提前停止
+        self.errors = []  # [(目录路径, 错误信息)]
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {
+            "folders_listed": self.folders_listed,
+            "folders_skipped": self.folders_skipped,
+            "files_found": self.files_found,
+            "truncated": self.truncated,
+            "errors": [{"path": path, "error": error} for path, error in self.errors[:100]],
+            "error_count": len(self.errors),
+        }
+
+    def __iter__(self):
+        folders = queue.Queue()
+        output = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        pending = [1]  # 已入队但未遍历完成的目录数
+
+        def put_output(item) -> bool:
+            while not stop.is_set():
+                try:
+                    output.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def enqueue_folder(path: str, depth: int):
+            if depth <= self.max_depth:
+                with self._lock:
+                    pending[0] += 1
+                folders.put((path, depth))
+            else:
+                with self._lock:
+                    self.folders_skipped += 1
+
+        def list_folder(path: str, depth: int):
+            children = self.completed_folders.get(path)
+            if children is not None:
+                # 断点续跑：目录已处理完成，只需继续处理其子目录
+                for child in children:
+                    enqueue_folder(child, depth + 1)
+                return
+            children = []
+            for entry in iter_file_list(dict(self.params, path=path), max_workers=self.page_workers, slug=self.slug):
+                if stop.is_set():
+                    return
+                if entry.get("dir", False):
+                    children.append(entry.get("path"))
+                    enqueue_folder(entry.get("path"), depth + 1)
+                elif not put_output(entry):
+                    return
+            if self.emit_folder_events and not stop.is_set():
+                put_output(FolderDone(path, children))
+
+        def worker():
+            while True:
+                path, depth = folders.get()
+                if path is None:
+                    return
+                try:
+                    if not stop.is_set():
+                        list_folder(path, depth)
+                except Exception as e:
+                    # 单个目录读取失败不影响其他目录
+                    logger.error(f"遍历目录 {path} 失败: {e}")
+                    with self._lock:
+                        self.errors.append((path, str(e)))
+                with self._lock:
+                    self.folders_listed += 1
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    put_output(_DONE)
+
+        folders.put((self.params.get("path"), 0))
+        threads = [threading.Thread(target=worker, name=f"namespace-walker-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = output.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, FolderDone):
+                    yield item
+                    continue
+                self.files_found += 1
+                yield item
+                if self.max_files and self.files_found >= self.max_files:
+                    self.truncated = True
+                    logger.warning(f"遍历 {self.params.get('path')} 已达到文件数上限 {self.max_files}，停止遍历")
+                    break
+        finally:
+            stop.set()
+            for _ in threads:
+                folders.put(_STOP)
+            logger.info(f"遍历 {self.params.get('path')} 结束: {self.stats()}")
+
+
+def iter_batches(items, batch_size: int):
+    """将可迭代对象按 batch_size 分批产出列表"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
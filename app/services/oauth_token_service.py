@@ -0,0 +1,134 @@
+import base64
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import Config
+from app.logger import get_logger
+
+# 获取日志记录器
+logger = get_logger()
+
+INVALID_TOKEN = "invalid token"
+
+
+class InvalidTokenError(Exception):
+    """外部接口返回 invalid token（token 过期或不存在）"""
+
+
+@dataclass(frozen=True)
+class AccessToken:
+    value: str
+    expires_at: float  # time.monotonic() 时间点
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+class TokenCache:
+    """
+    按 slug 缓存 /v2/oauth/token 获取的 token，线程安全。
+    - 距过期不足 refresh_margin 秒时提前刷新：一个线程负责刷新，其他线程在旧 token 仍有效时直接使用旧 token；
+    - token 已失效或被调用方判定为 invalid token 时，同一 slug 只有一个线程请求新 token，其余线程等待并复用结果。
+    """
+
+    def __init__(self, token_url: str = None, client_id: str = None, client_secret: str = None,
+                 refresh_margin: float = None, session=None):
+        self.token_url = token_url if token_url is not None else Config.EXTERNAL_OAUTH_TOKEN_URL
+        self.client_id = client_id if client_id is not None else Config.EXTERNAL_OAUTH_CLIENT_ID
+        self.client_secret = client_secret if client_secret is not None else Config.EXTERNAL_OAUTH_CLIENT_SECRET
+        self.refresh_margin = refresh_margin if refresh_margin is not None else Config.EXTERNAL_TOKEN_REFRESH_MARGIN
+        self.session = session
+        self._tokens = {}  # slug -> AccessToken
+        self._locks = {}  # slug -> 刷新锁
+        self._locks_lock = threading.Lock()
+        self.fetch_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token_url)
+
+    def _lock_for(self, slug: str) -> threading.Lock:
+        with self._locks_lock:
+            lock = self._locks.get(slug)
+            if lock is None:
+                lock = self._locks[slug] = threading.Lock()
+            return lock
+
+    def _fetch(self, slug: str) -> AccessToken:
+        """请求新 token：Basic 认证，表单参数 grant_type=client_with_su、scope=all、slug"""
+        if self.session is None:
+            from app.services.external_file_service import get_session
+            self.session = get_session()
+        credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode('utf-8')).decode('ascii')
+        response = self.session.post(
+            self.token_url,
+            headers={"Authorization": f"Basic {credentials}"},
+            data={"grant_type": "client_with_su", "scope": "all", "slug": slug},
+            timeout=Config.EXTERNAL_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "access_token" not in data:
+            raise RuntimeError(f"获取 token 失败: {data.get('error')} {data.get('error_description', '')}".strip())
+        expires_in = float(data.get("expires_in") or Config.EXTERNAL_TOKEN_DEFAULT_TTL)
+        self.fetch_count += 1
+        logger.info(f"已获取 slug={slug!r} 的 token，有效期 {expires_in:.0f} 秒")
+        return AccessToken(value=data["access_token"], expires_at=time.monotonic() + expires_in)
+
+    def get_token(self, slug: str = "") -> str:
+        token = self._tokens.get(slug)
+        if token is not None and token.remaining() > self.refresh_margin:
+            return token.value
+        lock = self._lock_for(slug)
+        if token is not None and token.remaining() > 0:
+            # 即将过期：只有拿到锁的线程刷新，其他线程继续使用仍然有效的旧 token
+            if not lock.acquire(blocking=False):
+                return token.value
+        else:
+            lock.acquire()
+        try:
+            current = self._tokens.get(slug)
+            # 等待期间其他线程已经刷新
+            if current is not None and current is not token and current.remaining() > self.refresh_margin:
+                return current.value
+            try:
+                new_token = self._fetch(slug)
+            except Exception as e:
+                if current is not None and current.remaining() > 0:
+                    logger.warning(f"刷新 slug={slug!r} 的 token 失败，继续使用旧 token: {e}")
+                    return current.value
+                raise
+            self._tokens[slug] = new_token
+            return new_token.value
+        finally:
+            lock.release()
+
+    def invalidate(self, slug: str, value: str):
+        """
+        调用方收到 invalid token 时作废对应的 token。
+        只作废与 value 相同的 token，避免把其他线程刚刷新的新 token 删除。
+        """
+        with self._lock_for(slug):
+            token = self._tokens.get(slug)
+            if token is not None and token.value == value:
+                del self._tokens[slug]
+
+
+def parse_token_response(response) -> tuple[bool, Any]:
+    """
+    解析外部接口的响应，返回 (token 是否失效, 响应 JSON)，调用方直接使用解析结果，不再重复解析响应体。
+    返回 401 或 {"error": "invalid token"} 时视为 token 失效；返回 401 或响应体不是 JSON 时响应 JSON 为 None。
+    """
+    if response.status_code == 401:
+        return True, None
+    try:
+        data = response.json()
+    except ValueError:
+        return False, None
+    return isinstance(data, dict) and data.get("error") == INVALID_TOKEN, data
+
+
+# 全局 token 缓存，未配置 EXTERNAL_OAUTH_TOKEN_URL 时外部接口请求不携带 token
+token_cache = TokenCache()
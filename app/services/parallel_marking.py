@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import Config
+from app.logger import get_logger
+from app.services.file_service import mark_file_list, mark_files
+from app.services.tag_store import tag_store
+from app.utils.rule_manager import rule_manager
+
+# 获取日志记录器
+logger = get_logger()
+
+
+def default_pool_workers(consumer_processes: int = None) -> int:
+    """
+    默认的打标子进程数：CPU 核数平分给各消费者进程，且不超过 MARK_POOL_MAX_WORKERS。
+    :param consumer_processes: 同一主机上的消费者进程数，默认 RPC_CONSUMER_PROCESSES
+    """
+    if Config.MARK_POOL_WORKERS:
+        return Config.MARK_POOL_WORKERS
+    consumer_processes = max(1, consumer_processes or Config.RPC_CONSUMER_PROCESSES)
+    return max(1, min(Config.MARK_POOL_MAX_WORKERS, (os.cpu_count() or 1) // consumer_processes))
+
+
+def _init_worker():
+    """子进程初始化：确保编译后的规则已加载（从磁盘缓存映射）"""
+    rules = rule_manager.current()
+    logger.info(f"打标子进程 {os.getpid()} 已就绪，规则版本 {rules.checksum[:12]}")
+
+
+def _project_item(file_item) -> tuple:
+    """取出打标需要的 (path, dir)；无法读取的元素返回 (None, False)，子进程中按缺少 path 处理并返回空标签"""
+    try:
+        return file_item.get("path"), file_item.get("dir", False)
+    except Exception as e:
+        logger.error(f"错误处理 {file_item}文件: {e}")
+        return None, False
+
+
+def _mark_chunk(chunk: list, checksum: str, error_value=""):
+    """
+    子进程中对一个分片打标。
+    :param chunk: [(path, dir), ...]
+    :param checksum: 父进程批次使用的规则摘要，子进程规则不一致时先重新加载
+    :param error_value: 处理出错的文件对应的结果
+    :return: (实际使用的规则摘要, 打标结果列表)
+    """
+    if rule_manager.current().checksum != checksum:
+        rule_manager.reload()
+    rules = rule_manager.current()
+    file_list = [{"path": path, "dir": is_dir} for path, is_dir in chunk]
+    # 结果由父进程统一持久化
+    return rules.checksum, mark_file_list(file_list, rules, error_value)
+
+
+class ParallelMarker:
+    """
+    多进程打标：常驻进程池，大批量的文件列表按分片分发到各子进程，结果按原顺序合并。
+    小批量直接在当前进程打标，避免进程间通信开销。
+    进程池使用 MARK_POOL_START_METHOD（默认 forkserver）启动子进程：当前进程中有消费者、工作线程等其他线程，
+    直接 fork 可能复制其他线程持有的锁导致子进程死锁。子进程在 MARK_PARALLEL_TIMEOUT 秒内未返回时
+    重建进程池并回退到当前进程打标。
+    """
+
+    def __init__(self, workers: int = None, threshold: int = None, chunk_size: int = None):
+        self.workers = workers if workers is not None else default_pool_workers()
+        self.threshold = threshold if threshold is not None else Config.MARK_PARALLEL_THRESHOLD
+        self.chunk_size = chunk_size if chunk_size is not None else Config.MARK_PARALLEL_CHUNK_SIZE
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # 子进程重新导入 app 包，不能再启动内嵌的 RPC 消费者；当前进程的 Config 已读取，不受影响
+                os.environ["RPC_CONSUMER_EMBEDDED"] = "0"
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 mp_context=multiprocessing.get_context(Config.MARK_POOL_START_METHOD))
+                logger.info(f"打标进程池已启动，进程数 {self.workers}")
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def shutdown(self):
+        self._reset_pool()
+
+    def mark_files(self, file_list: list) -> list[str]:
+        """
+        对文件列表打标，返回结果与 file_service.mark_files 一致。
+        """
+        if self.workers <= 1 or len(file_list) < self.threshold:
+            return mark_files(file_list)
+
+        rules = rule_manager.current()
+        if tag_store.enabled:
+            # 已保存结果的文件不再分发，只对新增或变化的文件多进程打标
+            return tag_store.mark_incremental(
+                file_list, rules.checksum, lambda files: self.mark_file_list(files, rules, error_value=None)
+            )
+        return self.mark_file_list(file_list, rules)
+
+    def mark_file_list(self, file_list: list, rules, error_value="") -> list:
+        """
+        使用指定的规则快照打标，不经过打标结果存储；达到阈值时分发到进程池
+        :param error_value: 处理出错的文件对应的结果，与 file_service.mark_file_list 相同
+        """
+        if self.workers <= 1 or len(file_list) < self.threshold:
+            return mark_file_list(file_list, rules, error_value)
+        # 只传递打标需要的字段，减少进程间序列化开销
+        items = [_project_item(item) for item in file_list]
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        try:
+            pool = self._get_pool()
+            futures = [pool.submit(_mark_chunk, chunk, rules.checksum, error_value) for chunk in chunks]
+            deadline = time.monotonic() + Config.MARK_PARALLEL_TIMEOUT
+            results = []
+            for future in futures:
+                checksum, chunk_results = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                if checksum != rules.checksum:
+                    # 子进程规则与本批次不一致，整批回退到当前进程，避免混用规则版本
+                    logger.warning("打标子进程规则版本不一致，回退到单进程打标")
+                    return mark_file_list(file_list, rules, error_value)
+                results.extend(chunk_results)
+            return results
+        except Exception as e:
+            # 超时（concurrent.futures.TimeoutError）同样重建进程池
+            logger.error(f"多进程打标失败，回退到单进程打标: {e!r}")
+            self._reset_pool()
+            return mark_file_list(file_list, rules, error_value)
+
+
+# 全局多进程打标器，进程池在首次遇到大批量时才创建
+parallel_marker = ParallelMarker()
@@ -1,19 +1,33 @@
+import functools
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pika
 import json
 from app.config import Config
 from app.logger import get_logger
-from app.services.file_service import mark_files  # 实现打标逻辑
+from app.services.parallel_marking import parallel_marker  # 实现打标逻辑（大批量时多进程）
+from app.services.rabbitmq_service import broadcast_rule_reload, process_origin
+from app.utils.rule_manager import rule_manager
+from app.utils.wire_format import (
+    ACCEPT_HEADER, COMPACT, CONTENT_TYPE_JSON, FORMAT_HEADER, SUPPORTED_HEADER,
+    decode_payload, encode_payload, expand_files, supported_content_types
+)
 # 获取日志记录器
 logger = get_logger()
 
-def on_request(ch, method, properties, body):
+def handle_request(body: bytes) -> str:
+    """处理一条 RPC 请求消息，返回响应消息内容"""
     try:
         message = json.loads(body.decode('utf-8'))
         task_type = message.get("task_type")
         if task_type == "mark_files":
             file_list = message.get("fileModelList")
             # 调用打标函数，得到打标结果列表
-            marking_results = mark_files(file_list)
+            marking_results = parallel_marker.mark_files(file_list)
             # 构造结果数据：假设返回一个列表，其中每个元素包含文件 ID 和打标结果
             result = []
             if len(marking_results) != len(file_list):
@@ -22,31 +36,223 @@ def on_request(ch, method, properties, body):
                 for idx, file_item in enumerate(file_list):
                     result.append({"neid": file_item.get("neid"), "tag": marking_results[idx]})
             response = json.dumps(result)
+        elif task_type == "reload_rules":
+            # 后台编译新规则，编译完成后原子切换，不阻塞当前消费者；同时通知其他消费者进程
+            force = bool(message.get("force", False))
+            started = rule_manager.reload_async(force=force)
+            broadcast_rule_reload(force=force)
+            current = rule_manager.current()
+            response = json.dumps({"reloading": started, "version": current.version, "checksum": current.checksum})
         else:
             response = json.dumps({"error": "未知任务类型"})
     except Exception as e:
         logger.error(f"错误处理 RPC 请求: {e}")
         response = json.dumps({"error": str(e)})
+    return response
 
+def handle_compact_request(body: bytes, properties) -> tuple[bytes, dict]:
+    """处理紧凑格式的打标请求，按请求相同的编码回复 {"tags": [...]} 或 {"error": ...}"""
+    content_type = properties.content_type or CONTENT_TYPE_JSON
+    try:
+        message = decode_payload(body, content_type, properties.content_encoding)
+        if message.get("task_type") == "mark_files":
+            file_list = expand_files(message.get("files"))
+            reply = {"tags": parallel_marker.mark_files(file_list)}
+        else:
+            reply = {"error": "未知任务类型"}
+    except Exception as e:
+        logger.error(f"错误处理 RPC 请求: {e}")
+        reply = {"error": str(e)}
+    if content_type not in supported_content_types():
+        content_type = CONTENT_TYPE_JSON
+    data, content_encoding = encode_payload(reply, content_type)
+    return data, {
+        "headers": {FORMAT_HEADER: COMPACT},
+        "content_type": content_type,
+        "content_encoding": content_encoding,
+    }
+
+def handle_message(body: bytes, properties) -> tuple:
+    """
+    按消息头选择消息格式处理请求，返回 (响应消息体, 响应消息属性参数)。
+    旧格式请求携带协商消息头时，在响应中声明支持的紧凑格式。
+    """
+    headers = properties.headers or {}
+    if headers.get(FORMAT_HEADER) == COMPACT:
+        return handle_compact_request(body, properties)
+    reply_properties = {}
+    if headers.get(ACCEPT_HEADER) == COMPACT:
+        reply_properties["headers"] = {SUPPORTED_HEADER: ",".join(supported_content_types())}
+    return handle_request(body), reply_properties
+
+def send_reply(ch, delivery_tag, properties, response, reply_properties: dict = None):
+    """发布响应并确认消息，必须在通道所属的连接线程中调用"""
     ch.basic_publish(
         exchange='',
         routing_key=properties.reply_to,
-        properties=pika.BasicProperties(correlation_id=properties.correlation_id),
+        properties=pika.BasicProperties(correlation_id=properties.correlation_id, **(reply_properties or {})),
         body=response
     )
-    ch.basic_ack(delivery_tag=method.delivery_tag)
+    ch.basic_ack(delivery_tag=delivery_tag)
+
+def on_request(ch, method, properties, body):
+    response, reply_properties = handle_message(body, properties)
+    send_reply(ch, method.delivery_tag, properties, response, reply_properties)
+
+
+class RpcConsumer:
+    """
+    RPC 消费者：一个连接 + 一个通道负责收发消息，打标在工作线程池中执行。
+    pika 连接不是线程安全的，工作线程通过 add_callback_threadsafe 把发布响应和 ack 交回连接线程。
+    """
+
+    def __init__(self, name: str, worker_threads: int, prefetch_count: int):
+        self.name = name
+        self.worker_threads = worker_threads
+        self.prefetch_count = prefetch_count
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix=f"{name}-worker")
+
+    def _process(self, connection, ch, method, properties, body):
+        response, reply_properties = handle_message(body, properties)
+        connection.add_callback_threadsafe(
+            functools.partial(send_reply, ch, method.delivery_tag, properties, response, reply_properties)
+        )
+
+    def run(self):
+        connection = pika.BlockingConnection(pika.ConnectionParameters(
+            host=Config.RABBITMQ_HOST,
+            credentials=pika.PlainCredentials(Config.RABBITMQ_USER, Config.RABBITMQ_PASSWORD)
+        ))
+        channel = connection.channel()
+        channel.queue_declare(queue=Config.RABBITMQ_QUEUE, durable=True)
+        channel.basic_qos(prefetch_count=self.prefetch_count)
+
+        def on_message(ch, method, properties, body):
+            self.executor.submit(self._process, connection, ch, method, properties, body)
+
+        channel.basic_consume(queue=Config.RABBITMQ_QUEUE, on_message_callback=on_message)
+        logger.info(f"消费者 {self.name} 正在等待消息 (工作线程 {self.worker_threads}, prefetch {self.prefetch_count})")
+        channel.start_consuming()
+
+    def run_forever(self):
+        """连接断开后自动重连"""
+        while True:
+            try:
+                self.run()
+            except pika.exceptions.AMQPError as e:
+                logger.error(f"消费者 {self.name} 连接异常，{Config.RPC_RECONNECT_DELAY} 秒后重连: {e}")
+                time.sleep(Config.RPC_RECONNECT_DELAY)
+
+
+def _reload_rules(force: bool):
+    try:
+        rule_manager.reload(force=force)
+    except Exception as e:
+        logger.error(f"重新加载打标规则失败: {e}")
+
+
+def listen_rule_reload():
+    """
+    接收 POST /rules/reload 的广播：每个消费者进程绑定一个临时队列到 RULE_RELOAD_EXCHANGE，
+    收到通知后在后台线程中重新加载规则（进程池子进程在下一批次发现规则摘要不一致时自动跟进）。
+    """
+    while True:
+        try:
+            connection = pika.BlockingConnection(pika.ConnectionParameters(
+                host=Config.RABBITMQ_HOST,
+                credentials=pika.PlainCredentials(Config.RABBITMQ_USER, Config.RABBITMQ_PASSWORD)
+            ))
+            channel = connection.channel()
+            channel.exchange_declare(exchange=Config.RULE_RELOAD_EXCHANGE, exchange_type='fanout', durable=True)
+            queue = channel.queue_declare(queue='', exclusive=True).method.queue
+            channel.queue_bind(exchange=Config.RULE_RELOAD_EXCHANGE, queue=queue)
+
+            def on_message(ch, method, properties, body):
+                try:
+                    message = json.loads(body.decode('utf-8'))
+                except ValueError:
+                    logger.error("无法解析规则重新加载通知")
+                    return
+                if message.get("origin") == process_origin():
+                    # 内嵌消费者与发出通知的 Web 进程是同一进程，已在本地重新加载
+                    return
+                logger.info("收到规则重新加载通知")
+                threading.Thread(target=_reload_rules, args=(bool(message.get("force", False)),), daemon=True).start()
+
+            channel.basic_consume(queue=queue, on_message_callback=on_message, auto_ack=True)
+            channel.start_consuming()
+        except pika.exceptions.AMQPError as e:
+            logger.error(f"规则重新加载通知连接异常，{Config.RPC_RECONNECT_DELAY} 秒后重连: {e}")
+            time.sleep(Config.RPC_RECONNECT_DELAY)
+
 
 def start_rpc_server():
-    connection = pika.BlockingConnection(pika.ConnectionParameters(
-        host=Config.RABBITMQ_HOST,
-        credentials=pika.PlainCredentials(Config.RABBITMQ_USER, Config.RABBITMQ_PASSWORD)
-    ))
-    channel = connection.channel()
-    channel.queue_declare(queue=Config.RABBITMQ_QUEUE, durable=True)
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(queue=Config.RABBITMQ_QUEUE, on_message_callback=on_request)
-    logger.info("消费者服务正在等待消息")
-    channel.start_consuming()
-
-if __name__ == "__main__":
-    start_rpc_server()
+    # 监听规则文件变化和重新加载通知，自动热更新
+    rule_manager.start_watcher()
+    threading.Thread(target=listen_rule_reload, name="rule-reload-listener", daemon=True).start()
+    worker_threads = max(1, Config.RPC_WORKER_THREADS)
+    prefetch_count = Config.RPC_PREFETCH_COUNT or worker_threads
+    consumers = [
+        RpcConsumer(f"rpc-consumer-{index}", worker_threads, prefetch_count)
+        for index in range(max(1, Config.RPC_CONSUMER_CONNECTIONS))
+    ]
+    # 额外的消费者在独立线程中运行，最后一个占用当前线程
+    for consumer in consumers[:-1]:
+        threading.Thread(target=consumer.run_forever, name=consumer.name, daemon=True).start()
+    consumers[-1].run_forever()
+
+
+def _spawn_consumer_process() -> int:
+    pid = os.fork()
+    if pid == 0:
+        # 子进程：恢复默认信号处理，运行消费者直到退出
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            start_rpc_server()
+        except Exception as e:
+            logger.error(f"消费者进程 {os.getpid()} 异常退出: {e}")
+        finally:
+            os._exit(1)
+    logger.info(f"消费者进程 {pid} 已启动")
+    return pid
+
+
+def run_consumer_processes(workers: int):
+    """
+    预先 fork 多个消费者进程。编译后的规则在 fork 前已加载，子进程以写时复制方式共享。
+    子进程异常退出时自动重新拉起，主进程收到 SIGTERM/SIGINT 时终止所有子进程。
+    """
+    if workers <= 1:
+        start_rpc_server()
+        return
+
+    children = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        children.add(_spawn_consumer_process())
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.error(f"消费者进程 {pid} 已退出 (状态 {status})，重新启动")
+            time.sleep(Config.RPC_RECONNECT_DELAY)
+            children.add(_spawn_consumer_process())
+    logger.info("所有消费者进程已退出")
@@ -1,5 +1,14 @@
-import pika
+import functools
+import itertools
+import json
+import os
+import socket
+import threading
+import time
 import uuid
+from concurrent.futures import Future
+
+import pika
 from app.config import Config
 from app.logger import get_logger
 
@@ -7,10 +16,17 @@ from app.logger import get_logger
 logger = get_logger()
 
 class RabbitMQServiceRPC:
+    """
+    线程安全的 RPC 客户端。
+    连接由独立的 I/O 线程持有，发布请求通过 add_callback_threadsafe 交给 I/O 线程执行；
+    每个请求按 correlation_id 对应一个 Future，任意线程可同时发起多个请求，等待期间不占用 CPU。
+    """
+
     def __init__(self):
         self.connection_params = pika.ConnectionParameters(
             host=Config.RABBITMQ_HOST,
-            credentials=pika.PlainCredentials(Config.RABBITMQ_USER, Config.RABBITMQ_PASSWORD)
+            credentials=pika.PlainCredentials(Config.RABBITMQ_USER, Config.RABBITMQ_PASSWORD),
+            heartbeat=Config.RPC_HEARTBEAT
         )
         self.connection = pika.BlockingConnection(self.connection_params)
         self.channel = self.connection.channel()
@@ -21,38 +37,288 @@ class RabbitMQServiceRPC:
             queue=self.callback_queue,
             on_message_callback=self.on_response,
             auto_ack=True)
-        self.response = None
-        self.corr_id = None
+        self._futures = {}  # correlation_id -> Future
+        self._deadlines = {}  # correlation_id -> 超时时间点（仅设置了超时的请求）
+        self._lock = threading.Lock()
+        self._closed = False
+        self.last_active = time.monotonic()  # 最近一次确认连接可用（收到响应或检查通过）的时间
+        self._io_thread = threading.Thread(target=self._io_loop, name="rabbitmq-rpc-io", daemon=True)
+        self._io_thread.start()
+
+    def _io_loop(self):
+        """I/O 线程：阻塞等待网络事件和跨线程回调，直到连接关闭"""
+        try:
+            while not self._closed:
+                self.connection.process_data_events(time_limit=1)
+                if self._deadlines:
+                    self._expire_timed_out()
+        except Exception as e:
+            logger.error(f"RPC 客户端连接异常: {e}")
+            self._fail_pending(e)
+        finally:
+            self._closed = True
+
+    def _expire_timed_out(self):
+        """使已超时的请求失败，迟到的响应会被丢弃"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for corr_id, deadline in list(self._deadlines.items()):
+                if deadline <= now:
+                    del self._deadlines[corr_id]
+                    future = self._futures.pop(corr_id, None)
+                    if future is not None:
+                        expired.append(future)
+        for future in expired:
+            if not future.done():
+                future.set_exception(TimeoutError("RPC 请求超时"))
+
+    def _fail_pending(self, error: Exception):
+        with self._lock:
+            futures, self._futures = self._futures, {}
+            self._deadlines.clear()
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"RPC 连接已断开: {error}"))
 
     def on_response(self, ch, method, props, body):
-        if self.corr_id == props.correlation_id:
-            self.response = body
+        with self._lock:
+            future = self._futures.pop(props.correlation_id, None)
+            self._deadlines.pop(props.correlation_id, None)
+        self.last_active = time.monotonic()
+        # 已超时被调用方放弃的请求直接丢弃响应
+        if future is not None and not future.done():
+            future.set_result((body, props) if future.raw else body.decode('utf-8'))
+
+    def _publish(self, corr_id: str, message, headers=None, content_type=None, content_encoding=None):
+        try:
+            self.channel.basic_publish(
+                exchange='',
+                routing_key=Config.RABBITMQ_QUEUE,
+                properties=pika.BasicProperties(
+                    reply_to=self.callback_queue,
+                    correlation_id=corr_id,
+                    delivery_mode=2,  # 消息持久化
+                    headers=headers,
+                    content_type=content_type,
+                    content_encoding=content_encoding
+                ),
+                body=message
+            )
+        except Exception as e:
+            with self._lock:
+                future = self._futures.pop(corr_id, None)
+                self._deadlines.pop(corr_id, None)
+            if future is not None and not future.done():
+                future.set_exception(e)
+
+    @property
+    def is_open(self) -> bool:
+        return not self._closed and self.connection.is_open and self._io_thread.is_alive()
+
+    @property
+    def in_io_thread(self) -> bool:
+        """当前线程是否为该连接的 I/O 线程（RPC 回调在其中执行）"""
+        return threading.current_thread() is self._io_thread
+
+    def ping(self, timeout: float) -> bool:
+        """
+        检查连接是否可用：由 I/O 线程向 broker 被动声明回调队列并等待确认，
+        同时验证 I/O 线程仍在处理事件、broker 仍能响应。
+        在 I/O 线程中调用时无法等待自身处理检查，只返回连接状态。
+        """
+        if not self.is_open:
+            return False
+        if self.in_io_thread:
+            return True
+        done = threading.Event()
+        result = [False]
+
+        def probe():
+            try:
+                self.channel.queue_declare(queue=self.callback_queue, passive=True)
+                result[0] = True
+            except Exception as e:
+                logger.error(f"RPC 连接检查失败: {e}")
+            finally:
+                done.set()
+
+        try:
+            self.connection.add_callback_threadsafe(probe)
+        except Exception as e:
+            logger.error(f"RPC 连接检查失败: {e}")
+            return False
+        if not done.wait(timeout) or not result[0]:
+            return False
+        self.last_active = time.monotonic()
+        return True
+
+    def call_async(self, message, timeout: float = None, headers: dict = None,
+                   content_type: str = None, content_encoding: str = None, raw: bool = False) -> Future:
+        """
+        发送 RPC 请求，立即返回 Future，结果为响应消息字符串。
+        :param timeout: 超时时间（秒），超时后 Future 以 TimeoutError 失败；为空表示不限时
+        :param headers: 消息头
+        :param content_type: 消息体类型
+        :param content_encoding: 消息体压缩方式
+        :param raw: 为 True 时 Future 结果为 (响应消息字节, 响应消息属性)
+        """
+        if not self.is_open:
+            raise ConnectionError("RPC 连接不可用")
+        corr_id = str(uuid.uuid4())
+        future = Future()
+        future.correlation_id = corr_id
+        future.raw = raw
+        with self._lock:
+            self._futures[corr_id] = future
+            if timeout is not None:
+                self._deadlines[corr_id] = time.monotonic() + timeout
+        self.connection.add_callback_threadsafe(functools.partial(
+            self._publish, corr_id, message, headers, content_type, content_encoding))
+        logger.info(f"向RPC发送信息 with correlation_id: {corr_id}")
+        return future
 
     def call(self, message: str, timeout: int = 10) -> str:
-        self.response = None
-        self.corr_id = str(uuid.uuid4())
-        self.channel.basic_publish(
-            exchange='',
-            routing_key=Config.RABBITMQ_QUEUE,
-            properties=pika.BasicProperties(
-                reply_to=self.callback_queue,
-                correlation_id=self.corr_id,
-                delivery_mode=2  # 消息持久化
-            ),
-            body=message
-        )
-        logger.info(f"向RPC发送信息: {message} with correlation_id: {self.corr_id}")
+        future = self.call_async(message)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # 超时后移除对应的 Future，迟到的响应会被丢弃
+            with self._lock:
+                self._futures.pop(future.correlation_id, None)
+                self._deadlines.pop(future.correlation_id, None)
+            logger.error("RPC 请求超时")
+            raise TimeoutError("RPC 请求超时")
 
-        # 等待响应，超时则抛出异常
-        import time
-        start_time = time.time()
-        while self.response is None:
-            self.connection.process_data_events()
-            if time.time() - start_time > timeout:
-                logger.error("RPC 请求超时")
-                raise TimeoutError("RPC 请求超时")
-        return self.response.decode('utf-8')
+    def close(self):
+        self._closed = True
+        if self._io_thread.is_alive() and self._io_thread is not threading.current_thread():
+            self._io_thread.join(timeout=2)
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self._fail_pending(ConnectionError("RPC 客户端已关闭"))
+
+
+class RabbitMQRPCPool:
+    """
+    RPC 客户端连接池：维护固定数量的连接槽位，按轮询分配请求。
+    连接在首次使用时才建立；槽位上的连接不可用时惰性重连，重连失败的槽位在
+    RPC_RECONNECT_DELAY 秒内不再尝试，请求转到其他槽位。
+    连接空闲超过 RPC_HEALTH_CHECK_INTERVAL 秒时，交给请求前先检查连接可用，检查失败则重连。
+    """
+
+    def __init__(self, size: int = None):
+        self.size = max(1, size if size is not None else Config.RPC_CLIENT_POOL_SIZE)
+        self._clients = [None] * self.size
+        self._retry_at = [0.0] * self.size  # 各槽位下次允许重连的时间
+        self._slot_locks = [threading.Lock() for _ in range(self.size)]
+        self._counter = itertools.count()
+
+    @staticmethod
+    def _usable(client, check: bool = False) -> bool:
+        """连接是否可以直接使用；check 为 True 时对空闲过久的连接做一次可用性检查"""
+        if client is None or not client.is_open:
+            return False
+        if time.monotonic() - client.last_active < Config.RPC_HEALTH_CHECK_INTERVAL:
+            return True
+        return check and client.ping(Config.RPC_HEALTH_CHECK_TIMEOUT)
+
+    def _get_client(self, slot: int):
+        client = self._clients[slot]
+        if self._usable(client):
+            return client
+        if client is not None and client.in_io_thread:
+            # 在该连接自身的回调中不检查、不关闭连接，连接已断开时转到其他槽位
+            return client if client.is_open else None
+        with self._slot_locks[slot]:
+            client = self._clients[slot]
+            if self._usable(client, check=True):
+                return client
+            if client is not None and client.in_io_thread:
+                return None
+            if time.monotonic() < self._retry_at[slot]:
+                return None
+            if client is not None:
+                logger.warning(f"RPC 连接池槽位 {slot} 的连接不可用，重新建立连接")
+                client.close()
+                self._clients[slot] = None
+            try:
+                client = RabbitMQServiceRPC()
+            except Exception as e:
+                self._retry_at[slot] = time.monotonic() + Config.RPC_RECONNECT_DELAY
+                logger.error(f"RPC 连接池槽位 {slot} 建立连接失败: {e}")
+                return None
+            self._clients[slot] = client
+            logger.info(f"RPC 连接池槽位 {slot} 已建立连接")
+            return client
+
+    def call_async(self, message, timeout: float = None, **kwargs) -> Future:
+        """
+        从连接池中选择一个可用连接发送请求，所有连接都不可用时抛出 ConnectionError。
+        其余参数与 RabbitMQServiceRPC.call_async 相同。
+        """
+        start = next(self._counter)
+        last_error = None
+        for offset in range(self.size):
+            client = self._get_client((start + offset) % self.size)
+            if client is None:
+                continue
+            try:
+                return client.call_async(message, timeout, **kwargs)
+            except Exception as e:
+                last_error = e
+        raise ConnectionError(f"没有可用的 RPC 连接: {last_error}")
+
+    def call(self, message: str, timeout: int = 10) -> str:
+        # 超时时间交给 I/O 线程，超时的请求会从客户端的 Future 表中移除
+        future = self.call_async(message, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            logger.error("RPC 请求超时")
+            raise TimeoutError("RPC 请求超时")
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "open": sum(1 for client in self._clients if client is not None and client.is_open),
+        }
+
+    def close(self):
+        for slot, client in enumerate(self._clients):
+            if client is not None:
+                client.close()
+                self._clients[slot] = None
+
+
+def process_origin() -> str:
+    """当前进程的标识（主机名:进程号），用于忽略本进程发出的广播"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def broadcast_rule_reload(force: bool = False):
+    """
+    通过 fanout 交换机通知所有消费者进程重新加载打标规则。
+    每个消费者进程各自绑定一个临时队列，未在线的进程启动时会加载最新规则，不需要补发。
+    连接失败时抛出异常。
+    """
+    connection = pika.BlockingConnection(pika.ConnectionParameters(
+        host=Config.RABBITMQ_HOST,
+        credentials=pika.PlainCredentials(Config.RABBITMQ_USER, Config.RABBITMQ_PASSWORD)
+    ))
+    try:
+        channel = connection.channel()
+        channel.exchange_declare(exchange=Config.RULE_RELOAD_EXCHANGE, exchange_type='fanout', durable=True)
+        channel.basic_publish(
+            exchange=Config.RULE_RELOAD_EXCHANGE,
+            routing_key='',
+            body=json.dumps({"force": force, "origin": process_origin()})
+        )
+    finally:
+        connection.close()
 
 
-# 创建全局 RPC 实例
-rabbitmq_rpc = RabbitMQServiceRPC()
+# 创建全局 RPC 连接池，连接在首次请求时建立
+rabbitmq_rpc = RabbitMQRPCPool()
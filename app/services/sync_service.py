@@ -0,0 +1,130 @@
+from datetime import datetime
+
+from app.config import Config
+from app.logger import get_logger
+from app.utils.db_engine import get_db_engine
+
+# 获取日志记录器
+logger = get_logger()
+
+CHANGE_ADDED = "added"
+CHANGE_CHANGED = "changed"
+CHANGE_DELETED = "deleted"
+
+
+class SnapshotStore:
+    """
+    增量同步的目录快照存储：每个同步根目录 (nsid, root_path) 下保存上次同步时各文件的 neid、rev 和路径。
+    """
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = max(1, batch_size or Config.SYNC_SNAPSHOT_BATCH_SIZE)
+        self._table = None
+
+    def _engine(self):
+        if self._table is None:
+            from app.models.file_model import FolderSnapshotEntry
+            self._table = FolderSnapshotEntry.__table__
+        return get_db_engine(self._table)
+
+    def load(self, root_path: str, nsid: int = None) -> dict:
+        """
+        读取根目录的快照，nsid 为空时读取该路径下所有命名空间的快照。
+        :return: {(nsid, neid): (rev, path)}
+        """
+        engine = self._engine()
+        table = self._table
+        query = table.select().with_only_columns(table.c.nsid, table.c.neid, table.c.rev, table.c.path) \
+            .where(table.c.root_path == root_path)
+        if nsid is not None:
+            query = query.where(table.c.nsid == nsid)
+        with engine.connect() as conn:
+            return {(row_nsid, neid): (rev, path) for row_nsid, neid, rev, path in conn.execute(query)}
+
+    def upsert(self, root_path: str, entries: list):
+        """写入新增或变化的文件：先按 neid 删除旧记录，再批量插入"""
+        if not entries:
+            return
+        engine = self._engine()
+        table = self._table
+        synced_at = datetime.utcnow()
+        rows = list({
+            (item.get("nsid"), item.get("neid")): {
+                "nsid": item.get("nsid"), "root_path": root_path, "neid": item.get("neid"),
+                "rev": item.get("rev"), "modified": item.get("modified"), "path": item.get("path"),
+                "synced_at": synced_at,
+            }
+            for item in entries
+        }.values())
+        with engine.begin() as conn:
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                self._delete(conn, root_path, [(row["nsid"], row["neid"]) for row in batch])
+                conn.execute(table.insert(), batch)
+
+    def delete(self, root_path: str, keys: list):
+        """删除已不存在的文件，keys 为 [(nsid, neid), ...]"""
+        if not keys:
+            return
+        engine = self._engine()
+        with engine.begin() as conn:
+            for i in range(0, len(keys), self.batch_size):
+                self._delete(conn, root_path, keys[i:i + self.batch_size])
+
+    def _delete(self, conn, root_path: str, keys: list):
+        table = self._table
+        by_nsid = {}
+        for nsid, neid in keys:
+            by_nsid.setdefault(nsid, []).append(neid)
+        for nsid, neids in by_nsid.items():
+            conn.execute(table.delete().where(
+                (table.c.root_path == root_path) & (table.c.nsid == nsid) & (table.c.neid.in_(neids))
+            ))
+
+
+class SnapshotDiff:
+    """
+    将一次完整遍历的结果与上次的快照比较：
+    - filter_changes 只放行新增（neid 不在快照中）和变化（rev 或路径不同）的文件；
+    - deleted 在遍历完整结束后返回快照中有、本次未出现的文件。
+    """
+
+    def __init__(self, snapshot: dict):
+        self.snapshot = snapshot
+        self.seen = set()
+        self.unchanged = 0
+        self.added = 0
+        self.changed = 0
+
+    def classify(self, item: dict):
+        """返回文件的变化类型，未变化时返回 None"""
+        key = (item.get("nsid"), item.get("neid"))
+        self.seen.add(key)
+        previous = self.snapshot.get(key)
+        if previous is None:
+            self.added += 1
+            return CHANGE_ADDED
+        if previous != (item.get("rev"), item.get("path")):
+            self.changed += 1
+            return CHANGE_CHANGED
+        self.unchanged += 1
+        return None
+
+    def filter_changes(self, items):
+        """逐个产出 (变化类型, 文件)，跳过未变化的文件"""
+        for item in items:
+            change = self.classify(item)
+            if change is not None:
+                yield change, item
+
+    def deleted(self) -> list:
+        """[(nsid, neid, path), ...]，只有遍历完整结束时结果才可靠"""
+        return [(nsid, neid, path) for (nsid, neid), (_, path) in self.snapshot.items()
+                if (nsid, neid) not in self.seen]
+
+    def stats(self) -> dict:
+        return {"added": self.added, "changed": self.changed, "unchanged": self.unchanged}
+
+
+# 全局目录快照存储
+snapshot_store = SnapshotStore()
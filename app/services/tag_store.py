@@ -0,0 +1,181 @@
+import time
+from datetime import datetime
+
+from app.config import Config
+from app.logger import get_logger
+from app.utils.db_engine import get_db_engine
+
+# 获取日志记录器
+logger = get_logger()
+
+
+class TagStore:
+    """
+    打标结果持久化：按 (neid, rev, 规则摘要) 保存标签，批量查询、批量 upsert。
+    文件版本、路径和规则都未变化时直接复用已保存的标签，只对新增或变化的文件重新打标。
+    数据库不可用时记录错误并在 MARK_RESULT_STORE_RETRY_DELAY 秒内跳过持久化，打标照常进行。
+    """
+
+    def __init__(self, enabled: bool = None, batch_size: int = None):
+        self.enabled = enabled if enabled is not None else Config.MARK_RESULT_STORE
+        self.batch_size = max(1, batch_size if batch_size is not None else Config.MARK_RESULT_STORE_BATCH_SIZE)
+        self._engine = None
+        self._table = None
+        self._retry_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and time.monotonic() >= self._retry_at
+
+    def _get_engine(self):
+        if self._engine is None:
+            from app.models.file_model import FileTagRecord
+            self._table = FileTagRecord.__table__
+            self._engine = get_db_engine(self._table)
+        return self._engine
+
+    def _on_error(self, action: str, error: Exception):
+        self._retry_at = time.monotonic() + Config.MARK_RESULT_STORE_RETRY_DELAY
+        logger.error(f"打标结果{action}失败，{Config.MARK_RESULT_STORE_RETRY_DELAY} 秒内跳过持久化: {error}")
+
+    def lookup(self, rule_checksum: str, neids: list) -> dict:
+        """
+        查询已保存的打标结果。
+        :return: {(neid, rev): (path, tag)}
+        """
+        if not neids or not self.available:
+            return {}
+        try:
+            engine = self._get_engine()
+            table = self._table
+            stored = {}
+            unique_neids = list(dict.fromkeys(neids))
+            with engine.connect() as conn:
+                for i in range(0, len(unique_neids), self.batch_size):
+                    rows = conn.execute(
+                        table.select()
+                        .with_only_columns(table.c.neid, table.c.rev, table.c.path, table.c.tag)
+                        .where(table.c.rule_checksum == rule_checksum)
+                        .where(table.c.neid.in_(unique_neids[i:i + self.batch_size]))
+                    )
+                    for neid, rev, path, tag in rows:
+                        stored[(neid, rev)] = (path, tag)
+            return stored
+        except Exception as e:
+            self._on_error("查询", e)
+            return {}
+
+    def _upsert_statement(self, dialect: str):
+        table = self._table
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table)
+            return stmt.on_duplicate_key_update(
+                path=stmt.inserted.path, tag=stmt.inserted.tag, marked_at=stmt.inserted.marked_at
+            )
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table)
+            return stmt.on_conflict_do_update(
+                index_elements=[table.c.neid, table.c.rev, table.c.rule_checksum],
+                set_={"path": stmt.excluded.path, "tag": stmt.excluded.tag, "marked_at": stmt.excluded.marked_at},
+            )
+        return None
+
+    def save(self, rule_checksum: str, records: list, raise_errors: bool = False) -> bool:
+        """
+        批量写入打标结果，已存在的 (neid, rev, 规则摘要) 更新路径和标签。
+        :param records: [(neid, rev, path, tag), ...]
+        :param raise_errors: 为 True 时忽略跳过持久化的时间窗口直接写入，写入失败或未启用持久化时抛出异常
+        :return: 结果是否已写入（没有需要写入的记录时为 True），跳过或写入失败时为 False
+        """
+        if raise_errors and not self.enabled:
+            raise RuntimeError("未启用打标结果持久化（MARK_RESULT_STORE）")
+        if not records:
+            return True
+        if not raise_errors and not self.available:
+            return False
+        try:
+            engine = self._get_engine()
+            marked_at = datetime.utcnow()
+            # 同一批次内重复的 key 只保留最后一条
+            rows = list({
+                (neid, rev): {"neid": neid, "rev": rev, "rule_checksum": rule_checksum,
+                              "path": path, "tag": tag, "marked_at": marked_at}
+                for neid, rev, path, tag in records
+            }.values())
+            stmt = self._upsert_statement(engine.dialect.name)
+            with engine.begin() as conn:
+                for i in range(0, len(rows), self.batch_size):
+                    batch = rows[i:i + self.batch_size]
+                    if stmt is not None:
+                        conn.execute(stmt, batch)
+                    else:
+                        self._merge_rows(conn, batch)
+            return True
+        except Exception as e:
+            self._on_error("保存", e)
+            if raise_errors:
+                raise
+            return False
+
+    def _merge_rows(self, conn, rows: list):
+        """不支持 upsert 语法的数据库：先删除已有记录再批量插入"""
+        table = self._table
+        for row in rows:
+            conn.execute(table.delete().where(
+                (table.c.neid == row["neid"]) & (table.c.rev == row["rev"])
+                & (table.c.rule_checksum == row["rule_checksum"])
+            ))
+        conn.execute(table.insert(), rows)
+
+    def mark_incremental(self, file_list: list, rule_checksum: str, mark_fn, save_fn=None) -> list[str]:
+        """
+        增量打标：带 neid 和 rev 的文件先查询已保存的结果，版本和路径都未变化的直接复用，
+        其余文件交给 mark_fn 打标，新结果写回数据库；打标出错的文件不保存，返回空字符串。
+        处于跳过持久化的时间窗口时不查询已保存的结果，新结果仍交给 save_fn。
+        :param mark_fn: mark_fn(file_list) -> 标签列表，顺序与输入一致，打标出错的文件为 None
+        :param save_fn: 新结果的写入方式 save_fn([(neid, rev, path, tag), ...])，默认立即调用 save 写入
+        :return: 标签列表，顺序与 file_list 一致
+        """
+        if not self.enabled:
+            return [tag if tag is not None else "" for tag in mark_fn(file_list)]
+        keyed = []  # (下标, neid, rev, path)
+        for idx, item in enumerate(file_list):
+            if not isinstance(item, dict):
+                # 无法读取的元素交给 mark_fn，按单个文件出错处理
+                continue
+            neid, rev, path = item.get("neid"), item.get("rev"), item.get("path")
+            if not item.get("dir", False) and neid and rev and path is not None:
+                keyed.append((idx, neid, rev, path))
+        stored = self.lookup(rule_checksum, [neid for _, neid, _, _ in keyed])
+
+        results = [None] * len(file_list)
+        for idx, neid, rev, path in keyed:
+            hit = stored.get((neid, rev))
+            if hit is not None and hit[0] == path:
+                results[idx] = hit[1]
+        pending = [idx for idx, tag in enumerate(results) if tag is None]
+        if pending:
+            tags = mark_fn([file_list[idx] for idx in pending])
+            marked = set()
+            for idx, tag in zip(pending, tags):
+                if tag is not None:
+                    results[idx] = tag
+                    marked.add(idx)
+            # 出错的结果不保存，下次重新打标
+            records = [(neid, rev, path, results[idx]) for idx, neid, rev, path in keyed if idx in marked]
+            if save_fn is not None:
+                save_fn(records)
+            else:
+                self.save(rule_checksum, records)
+        if keyed:
+            logger.info(f"增量打标: {len(file_list)} 个文件，复用已保存结果 {len(file_list) - len(pending)} 个")
+        return [tag if tag is not None else "" for tag in results]
+
+
+# 全局打标结果存储
+tag_store = TagStore()
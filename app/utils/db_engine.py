@@ -0,0 +1,52 @@
+import threading
+
+from sqlalchemy import inspect
+
+from app.logger import get_logger
+
+# 获取日志记录器
+logger = get_logger()
+
+_engine = None
+_created_tables = set()
+_lock = threading.Lock()
+
+
+def get_db_engine(*tables):
+    """
+    获取应用的数据库引擎（可在请求上下文之外使用），并确保给定的表及其索引已创建。
+    app 包初始化时会导入打标服务，这里延迟导入避免循环引用。
+    :param tables: 需要存在的 Table 对象
+    """
+    global _engine
+    missing = [table for table in tables if table.name not in _created_tables]
+    if _engine is not None and not missing:
+        return _engine
+    with _lock:
+        if _engine is None:
+            from app import app, db
+            with app.app_context():
+                _engine = db.engine
+        for table in missing:
+            if table.name not in _created_tables:
+                table.create(_engine, checkfirst=True)
+                create_missing_indexes(_engine, table)
+                _created_tables.add(table.name)
+    return _engine
+
+
+def create_missing_indexes(engine, table):
+    """
+    补建已存在的表上缺少的索引（按索引名比较，可重复执行）。
+    项目没有数据库迁移，create(checkfirst=True) 对已存在的表不做任何修改，模型中新增的索引需要在这里补建。
+    """
+    existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        try:
+            index.create(engine)
+            logger.info(f"已为表 {table.name} 补建索引 {index.name}")
+        except Exception as e:
+            # 多个进程同时补建时只有一个能成功
+            logger.warning(f"为表 {table.name} 补建索引 {index.name} 失败: {e}")
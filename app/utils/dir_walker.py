@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.config import Config
+
+
+def _scan_dir(dir_path: str, follow_symlinks: bool) -> tuple[list, list]:
+    """
+    扫描单个目录，返回 (文件 DirEntry 列表, 子目录路径列表)。
+    DirEntry 的类型来自目录项本身，大多数文件系统上判断文件/目录不需要额外 stat。
+    """
+    files = []
+    subdirs = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry)
+            except OSError:
+                # 扫描期间被删除或无权限访问的目录项直接跳过
+                continue
+    return files, subdirs
+
+
+def _scan_subdir(dir_path: str, follow_symlinks: bool) -> tuple[list, list]:
+    """扫描子目录，无权限访问或已被删除的子目录视为空目录"""
+    try:
+        return _scan_dir(dir_path, follow_symlinks)
+    except OSError:
+        return [], []
+
+
+def iter_files(folder_path: str, recursive: bool = False, max_workers: int = None, follow_symlinks: bool = False):
+    """
+    基于 os.scandir 遍历目录，逐个产出文件的 os.DirEntry（entry.name、entry.path 可直接使用）。
+    根目录无法访问时抛出 OSError；递归时无法访问的子目录跳过。
+    :param folder_path: 文件夹路径
+    :param recursive: 是否递归进入子目录
+    :param max_workers: 递归时并发扫描的目录数，默认 LOCAL_WALK_WORKERS，1 表示在当前线程中逐个扫描
+    :param follow_symlinks: 递归时是否进入指向目录的符号链接
+    """
+    files, subdirs = _scan_dir(folder_path, follow_symlinks)
+    yield from files
+    if not recursive or not subdirs:
+        return
+
+    max_workers = max(1, max_workers or Config.LOCAL_WALK_WORKERS)
+    if max_workers == 1:
+        stack = list(reversed(subdirs))
+        while stack:
+            files, subdirs = _scan_subdir(stack.pop(), follow_symlinks)
+            yield from files
+            stack.extend(reversed(subdirs))
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dir-walker")
+    try:
+        pending = {executor.submit(_scan_subdir, path, follow_symlinks) for path in subdirs}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                pending.update(executor.submit(_scan_subdir, path, follow_symlinks) for path in subdirs)
+                yield from files
+    finally:
+        # 调用方提前停止迭代时取消尚未开始的扫描
+        executor.shutdown(wait=False, cancel_futures=True)
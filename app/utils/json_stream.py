@@ -0,0 +1,128 @@
+import codecs
+import json
+
+###########################
+# 增量 JSON 解析
+###########################
+# 针对 {"key": value, ..., "fileModelList": [ {...}, {...} ], ...} 这种顶层对象，
+# 逐块读取输入流，数组中的元素解析出一个就交给调用方一个，不需要把整个请求体读入内存。
+
+_WHITESPACE = " \t\n\r"
+_SEPARATORS = ",:]}"  # 值之后合法的下一个字符
+_NUMBER_CHARS = "0123456789+-.eE"  # 可能是数字剩余部分的字符
+
+
+class JsonStreamError(ValueError):
+    """请求体不是合法的 JSON 或结构不符合预期"""
+
+
+class _Reader:
+    def __init__(self, stream, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.json_decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        """读取下一块数据，已读完时返回 False"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self.decoder.decode(b"", final=True)
+        else:
+            self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白并返回下一个字符，输入结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise JsonStreamError(f"JSON 格式错误: 位置 {self.pos} 处应为 '{char}'")
+        self.pos += 1
+
+    def value(self):
+        """
+        解析下一个完整的 JSON 值。值之后必须已经读到分隔符（',' ':' ']' '}'），
+        数字在数据块边界处被截断时（如 "12." 或 "1e"）继续读取后重新解析。
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                next_pos = end
+                while next_pos < len(self.buffer) and self.buffer[next_pos] in _WHITESPACE:
+                    next_pos += 1
+                if self.eof or (next_pos < len(self.buffer) and self._complete(value, end, next_pos)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise JsonStreamError(f"JSON 格式错误: {e}")
+            if not self.fill():
+                raise JsonStreamError("JSON 数据不完整")
+
+    def _complete(self, value, end: int, next_pos: int) -> bool:
+        """值之后已有字符时判断值是否完整，不完整的数字需要继续读取"""
+        if self.buffer[next_pos] in _SEPARATORS:
+            return True
+        if next_pos == end and isinstance(value, (int, float)) and self.buffer[end] in _NUMBER_CHARS:
+            return False
+        # 其他字符由调用方报告格式错误
+        return True
+
+
+def iter_object_stream(stream, array_key: str, on_field=None, chunk_size: int = 64 * 1024):
+    """
+    增量解析顶层 JSON 对象，逐个产出 array_key 数组中的元素。
+    :param stream: 可 read(n) 的字节流
+    :param array_key: 需要流式产出的数组字段名
+    :param on_field: 其他顶层字段的回调 on_field(key, value)
+    :param chunk_size: 每次读取的字节数
+    """
+    reader = _Reader(stream, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise JsonStreamError("JSON 格式错误: 对象的键必须是字符串")
+        reader.expect(":")
+        if key == array_key and reader.peek() == "[":
+            reader.pos += 1
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                        continue
+                    reader.expect("]")
+                    break
+        else:
+            value = reader.value()
+            if on_field is not None:
+                on_field(key, value)
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        break
+    if reader.peek() != "":
+        raise JsonStreamError("JSON 格式错误: 对象结束后还有多余数据")
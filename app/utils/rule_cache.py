@@ -0,0 +1,199 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import yaml
+
+from app.config import Config
+from app.logger import get_logger
+from app.utils.trie import CompiledTrie, build_trie_from_yaml_rules
+
+# 获取日志记录器
+logger = get_logger()
+
+###########################
+# 编译后规则的磁盘缓存
+###########################
+# 文件布局（本机字节序）：
+#   头部: magic | 格式版本 | 字节序标记 | 规则文件 sha256 | 6 个数组长度 | 元数据长度
+#   数组: edge_offsets, edge_chars, edge_targets, fail, word_ids, output（依次存放，4 字节对齐）
+#   元数据: JSON {"words": [...], "keyword_to_primary": {...}}
+
+CACHE_MAGIC = b'FMRC'
+CACHE_FORMAT_VERSION = 1
+_HEADER = struct.Struct('=4sIB32s6QQ')
+_HEADER_SIZE = (_HEADER.size + 7) // 8 * 8
+_ARRAY_FIELDS = (
+    ('edge_offsets', 'I'),
+    ('edge_chars', 'I'),
+    ('edge_targets', 'I'),
+    ('fail', 'I'),
+    ('word_ids', 'i'),
+    ('output', 'i'),
+)
+_BYTE_ORDER = 1 if sys.byteorder == 'little' else 2
+
+
+def cache_file_path(cache_dir: str, checksum: str) -> str:
+    """缓存文件按规则文件内容摘要和缓存格式版本命名"""
+    return os.path.join(cache_dir, f"MarkingRule.{checksum[:32]}.v{CACHE_FORMAT_VERSION}.bin")
+
+
+def _is_private(st) -> bool:
+    """文件或目录属于当前用户，且其他用户不可写（不支持 getuid 的平台只检查权限位）"""
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & 0o022
+
+
+def ensure_private_dir(cache_dir: str) -> bool:
+    """
+    创建仅当前用户可访问（0700）的缓存目录。目录已存在但属于其他用户或其他用户可写时返回 False，
+    此时不使用缓存，避免加载他人放置的缓存文件。
+    """
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        st = os.stat(cache_dir)
+    except OSError as e:
+        logger.warning(f"无法创建规则缓存目录 {cache_dir}: {e}")
+        return False
+    if not _is_private(st):
+        logger.warning(f"规则缓存目录 {cache_dir} 不属于当前用户或其他用户可写，不使用缓存")
+        return False
+    return True
+
+
+def save_compiled_rules(path: str, checksum: str, trie: CompiledTrie, keyword_to_primary: dict):
+    """
+    将编译后的自动机和关键词映射写入缓存文件（权限 0600）。
+    先写临时文件再 os.replace，保证并发启动的进程不会读到半个文件。
+    """
+    arrays = [getattr(trie, name) for name, _ in _ARRAY_FIELDS]
+    meta = json.dumps(
+        {"words": list(trie.words), "keyword_to_primary": keyword_to_primary},
+        ensure_ascii=False
+    ).encode('utf-8')
+    header = _HEADER.pack(
+        CACHE_MAGIC, CACHE_FORMAT_VERSION, _BYTE_ORDER, bytes.fromhex(checksum),
+        *[len(a) for a in arrays], len(meta)
+    )
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        for a in arrays:
+            f.write(memoryview(a).cast('B'))
+        f.write(meta)
+    os.replace(tmp_path, path)
+
+
+def _valid_arrays(arrays: list, word_count: int) -> bool:
+    """
+    检查数组长度和取值范围，保证构造自动机时不会越界或沿输出链接死循环：
+    状态按广度优先编号，失败指针和输出链接都指向编号更小的状态。
+    """
+    edge_offsets, edge_chars, edge_targets, fail, word_ids, output = arrays
+    state_count = len(fail)
+    if (state_count == 0 or len(edge_offsets) != state_count + 1 or len(word_ids) != state_count
+            or len(output) != state_count or len(edge_chars) != len(edge_targets)):
+        return False
+    if edge_offsets[0] != 0 or edge_offsets[state_count] != len(edge_chars):
+        return False
+    if any(edge_offsets[s] > edge_offsets[s + 1] for s in range(state_count)):
+        return False
+    if edge_chars and (max(edge_chars) > sys.maxunicode or min(edge_targets) < 1 or max(edge_targets) >= state_count):
+        return False
+    if fail[0] != 0 or output[0] != -1 or any(fail[s] >= s or output[s] >= s for s in range(1, state_count)):
+        return False
+    return min(output) >= -1 and min(word_ids) >= -1 and max(word_ids) < word_count
+
+
+def _parse_cache(buffer: memoryview, checksum: str):
+    """解析映射后的缓存内容，不匹配或内容无效时返回 None"""
+    if len(buffer) < _HEADER_SIZE:
+        return None
+    magic, version, byte_order, digest, *lengths = _HEADER.unpack_from(buffer)
+    meta_length = lengths.pop()
+    if (magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION
+            or byte_order != _BYTE_ORDER or digest.hex() != checksum):
+        return None
+
+    arrays = []
+    offset = _HEADER_SIZE
+    for (name, typecode), length in zip(_ARRAY_FIELDS, lengths):
+        size = length * struct.calcsize(typecode)
+        if offset + size > len(buffer):
+            return None
+        arrays.append(buffer[offset:offset + size].cast(typecode))
+        offset += size
+    if offset + meta_length != len(buffer):
+        return None
+    try:
+        meta = json.loads(bytes(buffer[offset:offset + meta_length]).decode('utf-8'))
+    except ValueError:
+        return None
+    if not isinstance(meta, dict):
+        return None
+    words, keyword_to_primary = meta.get("words"), meta.get("keyword_to_primary")
+    if (not isinstance(words, list) or not all(isinstance(word, str) for word in words)
+            or not isinstance(keyword_to_primary, dict) or not _valid_arrays(arrays, len(words))):
+        return None
+    return CompiledTrie(*arrays, words), keyword_to_primary
+
+
+def load_compiled_rules(path: str, checksum: str):
+    """
+    以内存映射方式加载缓存文件，数组直接引用映射内存，不做拷贝。
+    文件不存在、不属于当前用户、与规则文件摘要或格式版本不匹配、内容无效时返回 None。
+    :return: (CompiledTrie, keyword_to_primary) 或 None
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        if not _is_private(os.fstat(f.fileno())):
+            logger.warning(f"规则缓存文件 {path} 不属于当前用户或其他用户可写，忽略")
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    loaded = None
+    try:
+        loaded = _parse_cache(memoryview(mapped), checksum)
+    finally:
+        # 加载成功时数组仍引用映射内存，不能关闭
+        if loaded is None:
+            mapped.close()
+    return loaded
+
+
+def load_or_build_rules(rule_file: str, checksum: str, content: bytes, cache_dir: str = None):
+    """
+    优先从磁盘缓存加载编译后的规则；缓存缺失或失效时解析 YAML 重新编译并写回缓存。
+    :param rule_file: 规则文件路径（仅用于日志）
+    :param checksum: 规则文件内容的 sha256 摘要
+    :param content: 规则文件内容
+    :param cache_dir: 缓存目录，为空表示不使用缓存
+    :return: (CompiledTrie, keyword_to_primary)
+    """
+    cache_dir = Config.RULE_CACHE_DIR if cache_dir is None else cache_dir
+    start_time = time.perf_counter()
+    path = cache_file_path(cache_dir, checksum) if cache_dir and ensure_private_dir(cache_dir) else None
+    if path:
+        try:
+            loaded = load_compiled_rules(path, checksum)
+        except Exception as e:
+            logger.warning(f"读取规则缓存失败，将重新编译: {e}")
+            loaded = None
+        if loaded is not None:
+            logger.info(f"从缓存加载打标规则 {path}，耗时 {(time.perf_counter() - start_time) * 1000:.1f} ms")
+            return loaded
+
+    tag_data = yaml.safe_load(content.decode('utf-8')) or {}
+    trie, keyword_to_primary = build_trie_from_yaml_rules(tag_data)
+    logger.info(f"编译打标规则 {rule_file}，耗时 {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    if path:
+        try:
+            save_compiled_rules(path, checksum, trie, keyword_to_primary)
+        except Exception as e:
+            logger.warning(f"写入规则缓存失败: {e}")
+    return trie, keyword_to_primary
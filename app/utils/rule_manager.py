@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from app.config import Config
+from app.logger import get_logger
+from app.utils.rule_cache import load_or_build_rules
+from app.utils.trie import KeywordTable, build_keyword_table
+from app.utils.yaml_loader import read_rule_file
+
+# 获取日志记录器
+logger = get_logger()
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """一份已编译的打标规则快照，发布后不再修改"""
+    version: int  # 进程内单调递增的版本号
+    checksum: str  # 规则文件内容的 sha256 摘要
+    trie: object  # 编译后的自动机
+    keyword_to_primary: dict
+    keywords: KeywordTable  # 每个自动机输出对应的归一化关键词和一级标签
+    loaded_at: float = field(default_factory=time.time)
+
+
+class RuleManager:
+    """
+    打标规则管理器：持有当前生效的 RuleSet，支持后台重新编译并原子替换。
+    调用方在一批任务开始时取一次 current()，整批使用同一份快照，避免中途混用版本。
+    """
+
+    def __init__(self, rule_file: str):
+        self.rule_file = rule_file
+        self._current = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+        self._file_stat = self._stat_rule_file()
+        start_time = time.perf_counter()
+        content, checksum = read_rule_file(self.rule_file)
+        self._current = self._compile(1, content, checksum)
+        logger.info(f"打标规则加载完成，启动耗时 {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    def current(self) -> RuleSet:
+        return self._current
+
+    def add_listener(self, callback):
+        """注册规则切换回调，参数为 (old_rules, new_rules)"""
+        self._listeners.append(callback)
+
+    def _stat_rule_file(self):
+        try:
+            stat = os.stat(self.rule_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _compile(self, version: int, content: bytes, checksum: str) -> RuleSet:
+        trie, keyword_to_primary = load_or_build_rules(self.rule_file, checksum, content)
+        keywords = build_keyword_table(trie.words, keyword_to_primary)
+        return RuleSet(version=version, checksum=checksum, trie=trie,
+                       keyword_to_primary=keyword_to_primary, keywords=keywords)
+
+    def reload(self, force: bool = False) -> RuleSet:
+        """
+        重新读取并编译规则文件，编译完成后原子替换当前规则。
+        文件内容未变化且未指定 force 时保持原版本。编译失败时保留旧规则并抛出异常。
+        """
+        with self._reload_lock:
+            old_rules = self._current
+            self._file_stat = self._stat_rule_file()
+            content, checksum = read_rule_file(self.rule_file)
+            if checksum == old_rules.checksum and not force:
+                logger.info(f"规则文件未变化，保持版本 {old_rules.version}")
+                return old_rules
+            new_rules = self._compile(old_rules.version + 1, content, checksum)
+            # 引用赋值是原子的，正在处理的批次仍持有旧快照
+            self._current = new_rules
+            logger.info(f"打标规则已更新: 版本 {old_rules.version} -> {new_rules.version}")
+        for callback in self._listeners:
+            try:
+                callback(old_rules, new_rules)
+            except Exception as e:
+                logger.error(f"规则切换回调执行失败: {e}")
+        return new_rules
+
+    def reload_async(self, force: bool = False) -> bool:
+        """
+        在后台线程中重新加载规则，不阻塞调用方。
+        若已有重新加载在进行中则直接返回 False。
+        """
+        if self._reload_lock.locked():
+            return False
+
+        def run():
+            try:
+                self.reload(force=force)
+            except Exception as e:
+                logger.error(f"重新加载打标规则失败: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def start_watcher(self, interval: float = None):
+        """启动规则文件监听线程，定期检查文件修改时间和大小，变化后自动重新加载"""
+        interval = Config.RULE_WATCH_INTERVAL if interval is None else interval
+        if not interval or self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                if self._stat_rule_file() != self._file_stat:
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        logger.error(f"重新加载打标规则失败: {e}")
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+        logger.info(f"规则文件监听已启动: {self.rule_file}")
+
+
+# 全局规则管理器，启动时加载规则文件
+rule_manager = RuleManager(Config.MARKING_RULE_FILE)
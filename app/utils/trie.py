@@ -1,8 +1,10 @@
 import logging
+import sys
+from array import array
+from collections import deque
 
 # 假设 logger 已经配置好
 logger = logging.getLogger(__name__)
-from app.utils.yaml_loader import tag_data  # 读取 YAML 的 tag_data
 
 
 ###########################
@@ -14,11 +16,19 @@ class TrieNode:
         self.children = {}
         self.is_end = False
         self.word = None
+        self.fail = None  # 失败指针：指向当前路径的最长真后缀对应的节点
+        self.output = None  # 输出链接：沿失败指针能到达的最近一个 is_end 节点
 
 
 class Trie:
+    """
+    关键词 Trie 树，附带 Aho-Corasick 失败指针。
+    build() 之后 search_in_text 只需对文本做一次线性扫描。
+    """
+
     def __init__(self):
         self.root = TrieNode()
+        self._built = False
 
     def insert(self, word: str):
         node = self.root
@@ -28,27 +38,242 @@ class Trie:
             node = node.children[char]
         node.is_end = True
         node.word = word
+        # 插入新关键词后失败指针需要重新计算
+        self._built = False
+
+    def build(self):
+        """
+        按广度优先顺序为每个节点计算失败指针和输出链接（Aho-Corasick 自动机）。
+        """
+        root = self.root
+        root.fail = None
+        root.output = None
+        queue = deque()
+        for child in root.children.values():
+            child.fail = root
+            child.output = None
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in node.children.items():
+                fail = node.fail
+                while fail is not None and char not in fail.children:
+                    fail = fail.fail
+                child.fail = fail.children[char] if fail is not None else root
+                # 根节点不参与输出（空关键词在逐字匹配中从不命中）
+                child.output = child.fail if child.fail.is_end and child.fail is not root else child.fail.output
+                queue.append(child)
+        self._built = True
 
     def search_in_text(self, text: str):
         """
         在文本中查找所有匹配的关键词，返回一个列表，列表元素为 (index, matched_word)。
+        结果按起始位置排序，起始位置相同时短词在前，与逐位置回溯匹配的结果完全一致。
         """
+        if not self._built:
+            self.build()
+        root = self.root
+        node = root
         matches = []
-        for i in range(len(text)):
-            node = self.root
-            j = i
-            while j < len(text) and text[j] in node.children:
-                node = node.children[text[j]]
-                if node.is_end:
-                    matches.append((i, node.word))
-                j += 1
+        for j, char in enumerate(text):
+            while node is not root and char not in node.children:
+                node = node.fail
+            node = node.children.get(char, root)
+            hit = node if node.is_end and node is not root else node.output
+            while hit is not None:
+                matches.append((j - len(hit.word) + 1, hit.word))
+                hit = hit.output
+        # 同一起始位置的关键词长度各不相同，按 (起始位置, 长度) 排序即可还原原有顺序
+        matches.sort(key=lambda m: (m[0], len(m[1])))
         return matches
 
+    def compile(self):
+        """
+        将 Trie 树编译为只读的 CompiledTrie（扁平整数数组表示）。
+        """
+        if not self._built:
+            self.build()
+        # 按广度优先顺序为节点编号，根节点为 0
+        nodes = [self.root]
+        index = {id(self.root): 0}
+        position = 0
+        while position < len(nodes):
+            node = nodes[position]
+            for char in sorted(node.children):
+                child = node.children[char]
+                index[id(child)] = len(nodes)
+                nodes.append(child)
+            position += 1
+
+        edge_offsets = array('I', [0])
+        edge_chars = array('I')
+        edge_targets = array('I')
+        fail = array('I')
+        word_ids = array('i')
+        output = array('i')
+        words = []
+        for node in nodes:
+            # 每个节点的边按字符码点升序存放，查找时二分
+            for char in sorted(node.children):
+                edge_chars.append(ord(char))
+                edge_targets.append(index[id(node.children[char])])
+            edge_offsets.append(len(edge_chars))
+            fail.append(index[id(node.fail)] if node.fail is not None else 0)
+            output.append(index[id(node.output)] if node.output is not None else -1)
+            if node.is_end and node is not self.root:
+                word_ids.append(len(words))
+                words.append(node.word)
+            else:
+                word_ids.append(-1)
+        return CompiledTrie(edge_offsets, edge_chars, edge_targets, fail, word_ids, output, words)
+
+
+class _State:
+    """CompiledTrie 匹配用的状态：出边 {字符: 状态}、失败指针、命中的 (关键词长度 - 1, word_id)"""
+    __slots__ = ("children", "fail", "hits")
+
+
+class CompiledTrie:
+    """
+    编译后的 Aho-Corasick 自动机，使用扁平整数数组保存状态转移和输出：
+      - edge_offsets[s] ~ edge_offsets[s + 1] 为状态 s 的出边区间
+      - edge_chars / edge_targets 为按字符码点排序的边表
+      - fail[s] 为失败指针，output[s] 为输出链接（无则为 -1）
+      - word_ids[s] 为状态 s 对应的关键词下标（非终止状态为 -1）
+    扁平数组用于编译结果的磁盘缓存；构造时据此生成匹配用的状态对象（出边字典和预先展开的命中列表），
+    匹配时按字符查字典，不在数组上逐字符二分。
+    构造完成后即冻结，不再允许修改。
+    """
+
+    def __init__(self, edge_offsets, edge_chars, edge_targets, fail, word_ids, output, words):
+        self.edge_offsets = edge_offsets
+        self.edge_chars = edge_chars
+        self.edge_targets = edge_targets
+        self.fail = fail
+        self.word_ids = word_ids
+        self.output = output
+        self.words = tuple(words)
+        # 由数组生成匹配用的状态对象：出边字典直接指向目标状态，命中的关键词（含输出链接）预先展开
+        states = [_State() for _ in range(len(fail))]
+        for s, state in enumerate(states):
+            state.children = {chr(edge_chars[k]): states[edge_targets[k]]
+                              for k in range(edge_offsets[s], edge_offsets[s + 1])}
+            state.fail = states[fail[s]] if s else None
+            hits = []
+            hit = s if word_ids[s] >= 0 else output[s]
+            while hit >= 0:
+                hits.append((len(self.words[word_ids[hit]]) - 1, word_ids[hit]))
+                hit = output[hit]
+            state.hits = tuple(hits)
+        self._states = tuple(states)
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("CompiledTrie 已冻结，不允许修改")
+        object.__setattr__(self, name, value)
+
+    @property
+    def state_count(self) -> int:
+        return len(self.fail)
+
+    def memory_footprint(self) -> int:
+        """
+        返回自动机占用的内存字节数（整数数组 + 关键词字符串 + 匹配用的状态对象）。
+        """
+        arrays = (self.edge_offsets, self.edge_chars, self.edge_targets, self.fail, self.word_ids, self.output)
+        size = sum(memoryview(a).nbytes for a in arrays)
+        size += sys.getsizeof(self.words) + sum(sys.getsizeof(word) for word in self.words)
+        size += sys.getsizeof(self._states) + sum(
+            sys.getsizeof(state) + sys.getsizeof(state.children) + (sys.getsizeof(state.hits) if state.hits else 0)
+            for state in self._states
+        )
+        return size
+
+    def search_ids(self, text: str):
+        """
+        在文本中查找所有匹配的关键词，返回 (start, end, word_id) 列表，
+        按起始位置排序，起始位置相同时短词在前。
+        """
+        root = self._states[0]
+        state = root
+        matches = []
+        for j, char in enumerate(text):
+            target = state.children.get(char)
+            while target is None and state is not root:
+                state = state.fail
+                target = state.children.get(char)
+            state = target or root
+            if state.hits:
+                for offset, word_id in state.hits:
+                    matches.append((j - offset, j, word_id))
+        # (start, end) 唯一确定一个关键词，直接按元组排序
+        matches.sort()
+        return matches
+
+    def search_in_text(self, text: str):
+        """
+        在文本中查找所有匹配的关键词，返回一个列表，列表元素为 (index, matched_word)。
+        结果顺序与 Trie.search_in_text 一致。
+        """
+        words = self.words
+        return [(start, words[word_id]) for start, _, word_id in self.search_ids(text)]
+
+
+class KeywordTable:
+    """
+    自动机输出的预计算信息，按 word_id 下标：
+      - norm_ids[word_id]: 归一化关键词（去空格、小写）的标签 ID
+      - primary_ids[word_id]: 对应一级标签的标签 ID（一级标签无效时为 -1）
+    归一化关键词与一级标签共用同一套标签 ID，labels[tag_id] 为标签文本。
+    has_separator 表示是否存在包含路径分隔符 '/' 的关键词（此时不能按目录/文件名拆分扫描）。
+    """
+
+    def __init__(self, norm_ids, primary_ids, labels, has_separator=False):
+        self.norm_ids = norm_ids
+        self.primary_ids = primary_ids
+        self.labels = tuple(labels)
+        self.has_separator = has_separator
+
+
+def build_keyword_table(words, keyword_to_primary: dict) -> KeywordTable:
+    """
+    为自动机的每个输出关键词预先计算归一化结果和一级标签，
+    打标时只需按整数 ID 分组，无需重复归一化和查表。
+    """
+    tag_ids = {}
+    labels = []
+
+    def tag_id(label):
+        if label not in tag_ids:
+            tag_ids[label] = len(labels)
+            labels.append(label)
+        return tag_ids[label]
+
+    norm_ids = array('I')
+    primary_ids = array('i')
+    for word in words:
+        norm_keyword = word.strip().lower()
+        # 注意映射字典以原始关键词为键，这里与原有逻辑保持一致，使用归一化关键词查找
+        primary = keyword_to_primary.get(norm_keyword, "")
+        norm_ids.append(tag_id(norm_keyword))
+        if not isinstance(primary, str):
+            primary_ids.append(-1)
+            continue
+        primary = primary.strip()
+        if primary == "":
+            # 如果映射中没有一级标签，则以自身作为一级标签
+            primary = norm_keyword
+        primary_ids.append(tag_id(primary))
+    has_separator = any('/' in word for word in words)
+    return KeywordTable(norm_ids, primary_ids, labels, has_separator)
+
 
 def build_trie_from_yaml_rules(tag_data: dict):
     """
     根据 YAML 规则构造 Trie 树，并生成二级关键词到一级标签的映射字典。
-    返回 (trie, keyword_to_primary)。
+    Trie 树构建完成后编译为只读的 CompiledTrie，节点对象随之释放。
+    返回 (compiled_trie, keyword_to_primary)。
     """
     trie = Trie()
     keyword_to_primary = {}
@@ -58,8 +283,8 @@ def build_trie_from_yaml_rules(tag_data: dict):
                 trie.insert(secondary)
                 # 如果同一二级关键词出现在多个一级标签中，这里以最后一次出现为准
                 keyword_to_primary[secondary] = primary
-    return trie, keyword_to_primary
-
-
-# 构建全局 Trie 树和映射字典
-trie, keyword_to_primary = build_trie_from_yaml_rules(tag_data)
\ No newline at end of file
+    # 计算失败指针并编译为扁平数组，之后的匹配为单次线性扫描
+    compiled = trie.compile()
+    logger.info(f"标签自动机编译完成: 状态数 {compiled.state_count}, "
+                f"关键词数 {len(compiled.words)}, 内存占用 {compiled.memory_footprint()} 字节")
+    return compiled, keyword_to_primary
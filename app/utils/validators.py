@@ -1,8 +1,8 @@
-import os
 import re
 from werkzeug.exceptions import BadRequest
 
 from app.logger import logger
+from app.utils.dir_walker import iter_files
 
 
 class Validators:
@@ -78,30 +78,24 @@ class Validators:
             raise BadRequest("Invalid file extension")
 
     @staticmethod
-    def are_files_in_folder_valid(folder_path, allowed_extensions=None):
+    def are_files_in_folder_valid(folder_path, allowed_extensions=None, recursive=False, max_workers=None):
         """
         验证文件夹中的所有文件是否合规（即每个文件的扩展名是否有效）。
         :param folder_path: 文件夹路径
         :param allowed_extensions: 允许的文件扩展名列表
+        :param recursive: 是否同时验证子目录中的文件
+        :param max_workers: 递归时并发扫描的目录数，默认 LOCAL_WALK_WORKERS
         :return: 如果所有文件合规则返回 True，否则返回包含错误信息的列表
         """
-        invalid_files = []  # 用来存储不合规的文件
-
         try:
-            # 获取文件夹中的所有文件
-            files = os.listdir(folder_path)
-            # 排除非文件（如子文件夹）
-            files = [file for file in files if os.path.isfile(os.path.join(folder_path, file))]
-            # 验证每个文件的扩展名
-            for file in files:
+            # 逐个验证文件的扩展名，遇到第一个不合规的文件即停止遍历
+            for entry in iter_files(folder_path, recursive=recursive, max_workers=max_workers):
                 try:
-                    if not Validators.is_file_extension_valid(file, allowed_extensions):
-                        invalid_files.append(file)
+                    if not Validators.is_file_extension_valid(entry.name, allowed_extensions):
+                        return False
                 except BadRequest:
-                    # 捕捉到扩展名无效时的异常，不做中断处理
-                    invalid_files.append(file)
-            if invalid_files:
-                return False  # 返回不合规的文件名列表
+                    # 捕捉到扩展名无效时的异常
+                    return False
             return True
 
         except Exception as e:
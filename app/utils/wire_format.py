@@ -0,0 +1,126 @@
+import json
+import zlib
+
+from app.config import Config
+
+try:
+    import msgpack
+except ImportError:  # msgpack 为可选依赖，未安装时紧凑格式使用 JSON 数组编码
+    msgpack = None
+
+###########################
+# 打标 RPC 紧凑消息格式
+###########################
+# 请求: {"task_type": "mark_files", "files": [[path, dir, neid, rev], ...], ...}
+# 响应: {"tags": [tag, ...]}（顺序与请求一致）或 {"error": "..."}
+# 消息体使用 msgpack（可用时）或紧凑 JSON 编码，超过阈值时 zlib 压缩。
+#
+# 协商方式：
+#   - 客户端发送旧格式请求时携带 ACCEPT_HEADER，新版消费者在响应中携带 SUPPORTED_HEADER，
+#     旧版消费者忽略该消息头，客户端继续使用旧格式；
+#   - 客户端确认消费者支持后，后续请求改用紧凑格式并携带 FORMAT_HEADER，消费者按相同编码回复；
+#   - 紧凑格式请求收到旧格式响应（被旧版消费者处理）时，客户端回到旧格式并用旧格式重发该请求。
+
+FORMAT_HEADER = "x-wire-format"
+ACCEPT_HEADER = "x-accept-wire-format"
+SUPPORTED_HEADER = "x-wire-format-supported"
+COMPACT = "compact"
+
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_ENCODING_ZLIB = "zlib"
+
+
+def supported_content_types() -> list[str]:
+    """当前进程可以解码的紧凑格式消息体类型"""
+    return [CONTENT_TYPE_MSGPACK, CONTENT_TYPE_JSON] if msgpack is not None else [CONTENT_TYPE_JSON]
+
+
+def encode_payload(obj, content_type: str) -> tuple[bytes, str]:
+    """
+    编码消息体，超过 RPC_COMPRESS_THRESHOLD 字节时压缩。
+    :return: (消息体, content_encoding)
+    """
+    if content_type == CONTENT_TYPE_MSGPACK:
+        data = msgpack.packb(obj, use_bin_type=True)
+    else:
+        data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if Config.RPC_COMPRESS_THRESHOLD and len(data) >= Config.RPC_COMPRESS_THRESHOLD:
+        return zlib.compress(data, Config.RPC_COMPRESS_LEVEL), CONTENT_ENCODING_ZLIB
+    return data, None
+
+
+def decode_payload(data: bytes, content_type: str, content_encoding: str = None):
+    if content_encoding == CONTENT_ENCODING_ZLIB:
+        data = zlib.decompress(data)
+    elif content_encoding:
+        raise ValueError(f"不支持的消息压缩方式: {content_encoding}")
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("未安装 msgpack，无法解码消息")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode('utf-8'))
+
+
+def project_files(file_list: list) -> list:
+    """只保留消费者打标需要的字段: [path, dir, neid, rev]，neid 和 rev 用于复用已保存的打标结果"""
+    return [[item.get("path"), item.get("dir", False), item.get("neid"), item.get("rev")] for item in file_list]
+
+
+def expand_files(files: list) -> list:
+    """将紧凑格式的文件列表还原为字典列表，兼容不带 rev 的三元素格式"""
+    return [
+        {"path": entry[0], "dir": entry[1], "neid": entry[2], "rev": entry[3] if len(entry) > 3 else None}
+        for entry in files
+    ]
+
+
+class WireNegotiator:
+    """
+    客户端的消息格式协商状态。
+    RPC_WIRE_FORMAT: json 始终使用旧格式；compact 始终使用紧凑格式；
+    auto 先使用旧格式，收到消费者声明支持紧凑格式的响应后再切换。
+    """
+
+    def __init__(self, mode: str = None):
+        self.mode = mode or Config.RPC_WIRE_FORMAT
+        self._remote_types = None  # 消费者声明支持的消息体类型
+
+    def request_content_type(self):
+        """本次请求使用的紧凑格式消息体类型，返回 None 表示使用旧格式"""
+        if self.mode == "json":
+            return None
+        local_types = supported_content_types()
+        if self.mode == COMPACT:
+            return local_types[0]
+        if self._remote_types is None:
+            return None
+        for content_type in local_types:
+            if content_type in self._remote_types:
+                return content_type
+        return None
+
+    def request_headers(self):
+        """旧格式请求携带的协商消息头"""
+        if self.mode == "auto":
+            return {ACCEPT_HEADER: COMPACT}
+        return None
+
+    def observe_reply(self, headers):
+        """
+        记录消费者在响应中声明的紧凑格式支持情况。
+        所有消费者共用一个队列，滚动升级期间新旧版本同时存在：收到既未声明支持、也不是紧凑格式的响应，
+        说明该请求由旧版消费者处理，回到旧格式，之后由新版消费者的响应重新确认。
+        """
+        headers = headers or {}
+        supported = headers.get(SUPPORTED_HEADER)
+        if supported:
+            if isinstance(supported, bytes):
+                supported = supported.decode('utf-8')
+            self._remote_types = supported.split(",")
+        elif headers.get(FORMAT_HEADER) != COMPACT:
+            self._remote_types = None
+
+
+# 全局协商状态（客户端）
+wire_negotiator = WireNegotiator()
@@ -1,3 +1,5 @@
+import hashlib
+
 import yaml
 
 def load_yaml_tags(file_path: str) -> dict:
@@ -8,9 +10,12 @@ def load_yaml_tags(file_path: str) -> dict:
         return yaml.safe_load(f)
 
 
+def read_rule_file(file_path: str) -> tuple[bytes, str]:
+    """
+    读取规则文件原始内容，返回 (文件内容, sha256 摘要)，不做 YAML 解析。
+    摘要用于判断规则文件内容是否发生变化，以及定位编译缓存。
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    return content, hashlib.sha256(content).hexdigest()
 
-# 在项目启动时加载 YAML 文件内容到全局变量
-# 假设 YAML 文件路径为 ../config_table/MarkingRule.yaml
-tag_data = load_yaml_tags('config_table/MarkingRule.yaml')
-
-# print("加载的标签数据：", tag_data)
@@ -0,0 +1,68 @@
+"""
+处理记录写入性能对比：逐条 ORM 插入（每条提交一次）、逐条插入单事务提交、bulk_insert_file_records 批量插入。
+使用本地 SQLite 文件代替 MySQL，只用于比较不同写入方式的相对开销。
+
+运行方式（在项目根目录）：
+    RPC_CONSUMER_EMBEDDED=0 python -m benchmarks.bench_file_records --records 20000 --batch-size 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models.file_model import FileRecord
+from app.services.file_record_service import bulk_insert_file_records
+
+
+def build_records(count: int) -> list:
+    now = datetime.utcnow()
+    return [(f"/ent/项目{index % 50}/失效分析/培训课件_{index}.pptx", now) for index in range(count)]
+
+
+def fresh_engine(directory: str, name: str):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}.db")
+    FileRecord.__table__.create(engine)
+    return engine
+
+
+def insert_one_by_one(engine, records: list, commit_each: bool):
+    with Session(engine) as session:
+        for file_path, processed_at in records:
+            session.add(FileRecord(file_path, processed_at))
+            if commit_each:
+                session.commit()
+            else:
+                session.flush()
+        session.commit()
+
+
+def timed(label: str, func, count: int):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:10.1f} ms  {count / elapsed:12.0f} 条/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理记录写入性能对比")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    records = build_records(args.records)
+    print(f"记录数: {args.records}, 批大小: {args.batch_size}")
+    with tempfile.TemporaryDirectory() as directory:
+        engine = fresh_engine(directory, "one_by_one_commit")
+        timed("逐条插入（每条提交）", lambda: insert_one_by_one(engine, records, True), args.records)
+        engine = fresh_engine(directory, "one_by_one")
+        timed("逐条插入（单事务）", lambda: insert_one_by_one(engine, records, False), args.records)
+        engine = fresh_engine(directory, "bulk")
+        timed("批量插入", lambda: bulk_insert_file_records(records, args.batch_size, engine), args.records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+关键词匹配性能对比：逐位置回溯匹配（优化前）、Trie 上的 Aho-Corasick 自动机、编译后的 CompiledTrie。
+
+运行方式（在项目根目录）：
+    RPC_CONSUMER_EMBEDDED=0 python -m benchmarks.bench_trie --rules 300 --paths 2000 --segment 20
+    RPC_CONSUMER_EMBEDDED=0 python -m benchmarks.bench_trie --rules 3000 --paths 2000 --segment 60
+"""
+import argparse
+import random
+import time
+
+from app.utils.trie import Trie
+
+# 关键词和路径使用的字符，中文字符占多数，与实际规则接近
+ALPHABET = "失效跳水问题培训课件分析报告设计评审测试方案项目计划总结会议纪要质量客户产品" + "abcdefgh0123_-."
+
+
+def build_rules(count: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 6))))
+    return sorted(words)
+
+
+def build_paths(count: int, segment: int, words: list[str], rng: random.Random) -> list[str]:
+    paths = []
+    for _ in range(count):
+        parts = []
+        for _ in range(3):
+            chars = [rng.choice(ALPHABET) for _ in range(segment)]
+            # 每段插入几个关键词，保证有命中
+            for word in rng.sample(words, 2):
+                pos = rng.randrange(segment)
+                chars[pos:pos] = word
+            parts.append("".join(chars))
+        paths.append("/" + "/".join(parts) + ".docx")
+    return paths
+
+
+def naive_search(root, text: str):
+    """优化前的匹配方式：从每个位置出发沿 Trie 向下匹配"""
+    matches = []
+    for i in range(len(text)):
+        node = root
+        j = i
+        while j < len(text) and text[j] in node.children:
+            node = node.children[text[j]]
+            if node.is_end:
+                matches.append((i, node.word))
+            j += 1
+    return matches
+
+
+def bench(searches: dict, paths: list[str], repeat: int) -> dict:
+    """各方式轮流运行 repeat 轮，取各自最快一轮的每条路径耗时（毫秒）"""
+    best = {}
+    for _ in range(repeat):
+        for name, search in searches.items():
+            start = time.perf_counter()
+            for path in paths:
+                search(path)
+            elapsed = time.perf_counter() - start
+            best[name] = min(best.get(name, elapsed), elapsed)
+    result = {name: elapsed * 1000 / len(paths) for name, elapsed in best.items()}
+    for name, per_path in result.items():
+        print(f"{name:<10} {per_path:8.4f} ms/path")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=300, help="关键词数")
+    parser.add_argument("--paths", type=int, default=2000, help="路径数")
+    parser.add_argument("--segment", type=int, default=20, help="路径每段的随机字符数")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数，取最快一次")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = build_rules(args.rules, rng)
+    paths = build_paths(args.paths, args.segment, words, rng)
+    trie = Trie()
+    for word in words:
+        trie.insert(word)
+    trie.build()
+    compiled = trie.compile()
+
+    # 三种方式的结果必须一致（逐位置匹配按起始位置、长度排序后比较）
+    for path in paths:
+        expected = trie.search_in_text(path)
+        assert sorted(naive_search(trie.root, path), key=lambda m: (m[0], len(m[1]))) == expected
+        assert compiled.search_in_text(path) == expected
+
+    print(f"关键词 {len(words)} 个，状态数 {compiled.state_count}，"
+          f"平均路径长度 {sum(map(len, paths)) / len(paths):.0f}，内存占用 {compiled.memory_footprint()} 字节")
+    result = bench({
+        "baseline": lambda path: naive_search(trie.root, path),
+        "automaton": trie.search_in_text,
+        "compiled": compiled.search_ids,
+    }, paths, args.repeat)
+    print(f"compiled 相对 baseline {result['baseline'] / result['compiled']:.2f}x，"
+          f"相对 automaton {result['automaton'] / result['compiled']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+文件列表校验性能对比：marshmallow FileListSchema 与快速校验 fast_load_file_list。
+
+运行方式（在项目根目录）：
+    RPC_CONSUMER_EMBEDDED=0 python -m benchmarks.bench_validation --files 10000 --repeat 5
+"""
+import argparse
+import copy
+import time
+
+from app.schemas.fast_validator import fast_load_file_list
+from app.schemas.file_schema import FileListSchema
+
+
+def build_payload(count: int) -> dict:
+    file_list = []
+    for index in range(count):
+        file_list.append({
+            "desc": "",
+            "dir": index % 10 == 0,
+            "modified": "2024-01-01 00:00:00",
+            "neid": str(100000 + index),
+            "nsid": 1,
+            "path": f"/ent/项目{index % 50}/失效分析/培训课件_{index}.pptx",
+            "pathType": "ent",
+            "rev": "1",
+            "size": "102400",
+            "creator": "admin",
+            "creatorUid": "1",
+            "updator": "admin",
+            "updatorUid": "1",
+            "isTeam": False,
+            "bookmarkId": 0,
+            "supportPreview": True,
+            "deliveryCode": "",
+            "isBookmark": False,
+        })
+    return {"errcode": "0", "errmsg": "ok", "fileModelList": file_list, "total": count}
+
+
+def bench(name: str, load, payload: dict, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        data = copy.deepcopy(payload)
+        start = time.perf_counter()
+        load(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    count = len(payload["fileModelList"])
+    print(f"{name:<10} {best * 1000:10.1f} ms  {count / best:12.0f} files/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10000, help="每次校验的文件数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次")
+    args = parser.parse_args()
+
+    payload = build_payload(args.files)
+    # 两种方式的结果必须一致
+    assert fast_load_file_list(copy.deepcopy(payload)) == FileListSchema().load(copy.deepcopy(payload))
+
+    schema_time = bench("schema", FileListSchema().load, payload, args.repeat)
+    fast_time = bench("fast", fast_load_file_list, payload, args.repeat)
+    print(f"speedup    {schema_time / fast_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# 测试进程中不启动内嵌的 RabbitMQ 消费者
+os.environ.setdefault("RPC_CONSUMER_EMBEDDED", "0")
@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+from app.utils.json_stream import JsonStreamError, iter_object_stream
+
+BODIES = [
+    '{"fileModelList":[{"a":1}],"total":12.5}',
+    '{"errcode":"0","total":1e3,"fileModelList":[{"size":-0.25E+2,"n":1234567},{"path":"/企业/失效培训.pdf"}]}',
+    '{"fileModelList":[],"total":0}',
+    '{ "total" : 10 , "fileModelList" : [ 1 , 2.0 , [3, 4] , null , true ] , "errmsg" : "ok" }',
+    '{}',
+]
+
+
+def parse(body: str, chunk_size: int):
+    fields = {}
+    items = list(iter_object_stream(io.BytesIO(body.encode("utf-8")), "fileModelList",
+                                    on_field=fields.__setitem__, chunk_size=chunk_size))
+    return items, fields
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_every_chunk_size_matches_json_loads(body):
+    expected = json.loads(body)
+    expected_items = expected.pop("fileModelList", [])
+    for chunk_size in range(1, len(body.encode("utf-8")) + 2):
+        items, fields = parse(body, chunk_size)
+        assert items == expected_items, chunk_size
+        assert fields == expected, chunk_size
+
+
+@pytest.mark.parametrize("body", [
+    '{"fileModelList":[{"a":1}],"total":12.}',
+    '{"fileModelList":[1 2]}',
+    '{"total":1}x',
+    '{"fileModelList":[{"a":1}',
+])
+def test_invalid_json_raises_for_every_chunk_size(body):
+    for chunk_size in range(1, len(body) + 2):
+        with pytest.raises(JsonStreamError):
+            parse(body, chunk_size)
@@ -0,0 +1,129 @@
+import json
+import queue
+import threading
+import time
+import types
+
+import pika
+import pytest
+
+from app.config import Config
+from app.services import mark_dispatcher, rabbitmq_service
+from app.utils.wire_format import wire_negotiator
+
+
+class FakeChannel:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def queue_declare(self, queue="", exclusive=False, passive=False):
+        return types.SimpleNamespace(method=types.SimpleNamespace(queue="callback"))
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False):
+        self.connection.on_message = on_message_callback
+
+    def basic_publish(self, exchange, routing_key, properties, body):
+        self.connection.broker.receive(self.connection, body, properties)
+
+
+class FakeConnection:
+    """模拟 pika.BlockingConnection：跨线程回调和响应都在调用 process_data_events 的 I/O 线程中执行"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.on_message = None
+        self._callbacks = queue.Queue()
+
+    def channel(self):
+        return FakeChannel(self)
+
+    def add_callback_threadsafe(self, callback):
+        if not self.is_open:
+            raise pika.exceptions.ConnectionWrongStateError()
+        self._callbacks.put(callback)
+
+    def deliver(self, correlation_id, body):
+        props = types.SimpleNamespace(correlation_id=correlation_id, headers=None,
+                                      content_type=None, content_encoding=None)
+        self._callbacks.put(lambda: self.on_message(None, None, props, body))
+
+    def process_data_events(self, time_limit=0):
+        try:
+            callback = self._callbacks.get(timeout=min(time_limit, 0.05))
+        except queue.Empty:
+            return
+        callback()
+
+    def close(self):
+        self.is_open = False
+
+
+class FakeBroker:
+    """丢弃前 drop 条请求，其余请求立即回复空标签"""
+
+    def __init__(self, drop: int):
+        self.drop = drop
+        self.received = 0
+        self.connections = []
+
+    def connect(self, *args, **kwargs):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+    def receive(self, connection, body, properties):
+        self.received += 1
+        if self.received <= self.drop:
+            return
+        files = json.loads(body)["fileModelList"]
+        reply = json.dumps([{"neid": item["neid"], "tag": ""} for item in files]).encode("utf-8")
+        threading.Thread(target=connection.deliver, args=(properties.correlation_id, reply)).start()
+
+
+@pytest.fixture
+def single_client_pool(monkeypatch):
+    broker = FakeBroker(drop=1)
+    monkeypatch.setattr(pika, "BlockingConnection", broker.connect)
+    # 每次取连接都做可用性检查，模拟长时间超时后的重试
+    monkeypatch.setattr(Config, "RPC_HEALTH_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(Config, "RPC_HEALTH_CHECK_TIMEOUT", 1)
+    monkeypatch.setattr(Config, "MARK_FANOUT_RETRIES", 1)
+    monkeypatch.setattr(wire_negotiator, "mode", "json")
+    pool = rabbitmq_service.RabbitMQRPCPool(size=1)
+    monkeypatch.setattr(mark_dispatcher, "rabbitmq_rpc", pool)
+    yield broker, pool
+    pool.close()
+
+
+def test_retry_after_timeout_reuses_single_client(single_client_pool):
+    broker, pool = single_client_pool
+    files = [{"neid": i, "path": f"/a/{i}.txt", "dir": False} for i in range(3)]
+
+    start = time.monotonic()
+    result = mark_dispatcher.mark_files_remote(files, timeout=0.2).result(timeout=5)
+
+    assert result == [{"neid": i, "tag": ""} for i in range(3)]
+    assert broker.received == 2
+    # 重试不在 I/O 线程中检查连接，连接检查成功，原连接没有被关闭重建
+    assert len(broker.connections) == 1 and broker.connections[0].is_open
+    assert time.monotonic() - start < Config.RPC_HEALTH_CHECK_TIMEOUT + 1
+
+
+def test_pool_skips_health_check_on_client_io_thread(single_client_pool):
+    broker, pool = single_client_pool
+    client = pool._get_client(0)
+    picked = []
+    done = threading.Event()
+
+    def from_io_thread():
+        picked.append(pool._get_client(0))
+        done.set()
+
+    start = time.monotonic()
+    client.connection.add_callback_threadsafe(from_io_thread)
+    assert done.wait(5)
+    # 在连接自身的 I/O 线程中取连接不等待检查，也不关闭重建连接
+    assert picked == [client]
+    assert time.monotonic() - start < Config.RPC_HEALTH_CHECK_TIMEOUT
+    assert len(broker.connections) == 1 and client.is_open
@@ -0,0 +1,131 @@
+import random
+
+import pytest
+
+from app.services import file_service
+from app.utils.rule_manager import RuleSet
+from app.utils.trie import Trie, build_keyword_table, build_trie_from_yaml_rules
+
+# 关键词和路径使用的字符：包含大小写、空格和路径分隔符，覆盖归一化和按目录/文件名拆分扫描
+ALPHABET = "失效跳水问题培训课件分析报告aAbB c/"
+PRIMARIES = ["质量", "培训", "分析", "Aa", " 报告 ", "", 1]
+
+
+def naive_search(root, text: str):
+    """优化前的 Trie.search_in_text：从每个位置出发沿 Trie 向下匹配"""
+    matches = []
+    for i in range(len(text)):
+        node = root
+        j = i
+        while j < len(text) and text[j] in node.children:
+            node = node.children[text[j]]
+            if node.is_end:
+                matches.append((i, node.word))
+            j += 1
+    return matches
+
+
+def reference_mark_file(path: str, root, keyword_to_primary: dict) -> str:
+    """优化前的 mark_file，作为对照实现"""
+    try:
+        matches = naive_search(root, path)
+        if not matches:
+            return ""
+        occurrences = []
+        for index, keyword in matches:
+            occurrences.append((index, keyword.strip().lower()))
+        occurrences.sort(key=lambda x: x[0])
+
+        groups = {}
+        for pos, norm_keyword in occurrences:
+            primary = keyword_to_primary.get(norm_keyword, "").strip()
+            if primary == "":
+                primary = norm_keyword
+            if primary not in groups:
+                groups[primary] = []
+            if norm_keyword not in groups[primary]:
+                groups[primary].append(norm_keyword)
+
+        primary_order = []
+        seen_primary = set()
+        for pos, norm_keyword in occurrences:
+            primary = keyword_to_primary.get(norm_keyword, "").strip()
+            if primary == "":
+                primary = norm_keyword
+            if primary not in seen_primary:
+                seen_primary.add(primary)
+                primary_order.append(primary)
+
+        result_parts = []
+        for primary in primary_order:
+            secondaries = groups.get(primary, [])
+            group_tags = [primary] + [sec for sec in secondaries if sec != primary]
+            result_parts.append(", ".join(group_tags))
+        return "; ".join(result_parts)
+    except Exception:
+        return ""
+
+
+def random_word(rng: random.Random, alphabet: str) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+
+
+def random_rules(rng: random.Random) -> dict:
+    """随机生成 YAML 规则：同一关键词可能属于多个一级标签，一级标签也可能作为自身的二级标签"""
+    # 部分规则集包含带 '/' 的关键词，此时 SegmentMarker 退回整段扫描
+    alphabet = ALPHABET if rng.random() < 0.3 else ALPHABET.replace("/", "")
+    tag_data = {}
+    for primary in rng.sample(PRIMARIES, rng.randint(1, len(PRIMARIES))):
+        secondaries = [random_word(rng, alphabet) for _ in range(rng.randint(0, 8))]
+        if isinstance(primary, str) and primary.strip() and rng.random() < 0.5:
+            secondaries.append(primary.strip())
+        tag_data[primary] = secondaries
+    return tag_data
+
+
+def random_path(rng: random.Random, words: list) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        chars = [rng.choice(ALPHABET) for _ in range(rng.randint(0, 12))]
+        for word in rng.sample(words, min(len(words), rng.randint(0, 3))):
+            pos = rng.randint(0, len(chars))
+            chars[pos:pos] = word
+        parts.append("".join(chars))
+    return "/".join(parts)
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    # 各规则集的版本号相同，关闭结果缓存避免互相命中
+    monkeypatch.setattr(file_service, "mark_result_cache", None)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_marking_matches_original_mark_file(seed, monkeypatch):
+    rng = random.Random(seed)
+    tag_data = random_rules(rng)
+    compiled, keyword_to_primary = build_trie_from_yaml_rules(tag_data)
+    rules = RuleSet(version=1, checksum=str(seed), trie=compiled, keyword_to_primary=keyword_to_primary,
+                    keywords=build_keyword_table(compiled.words, keyword_to_primary))
+    trie = Trie()
+    for word in keyword_to_primary:
+        trie.insert(word)
+    trie.build()
+
+    words = list(keyword_to_primary) or ["无"]
+    paths = [random_path(rng, words) for _ in range(100)]
+    # 批量打标时重复出现的目录和文件名
+    paths += [rng.choice(paths) for _ in range(20)]
+    expected = [reference_mark_file(path, trie.root, keyword_to_primary) for path in paths]
+
+    for path, tag in zip(paths, expected):
+        # Aho-Corasick 自动机与逐位置匹配得到相同的匹配，按出现位置、长度排序
+        naive = sorted(naive_search(trie.root, path), key=lambda m: (m[0], len(m[1])))
+        assert trie.search_in_text(path) == naive
+        assert compiled.search_in_text(path) == naive
+        assert file_service.mark_file(path, rules) == tag
+
+    file_list = [{"path": path, "dir": False} for path in paths]
+    for dedup in (True, False):
+        monkeypatch.setattr(file_service.Config, "MARK_BATCH_DEDUP", dedup)
+        assert file_service.mark_file_list(file_list, rules) == expected
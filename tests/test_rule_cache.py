@@ -0,0 +1,65 @@
+import os
+import struct
+
+import pytest
+
+from app.utils import rule_cache
+from app.utils.trie import Trie
+
+CHECKSUM = "ab" * 32
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    cache_dir = str(tmp_path / "rule_cache")
+    assert rule_cache.ensure_private_dir(cache_dir)
+    trie = Trie()
+    for word in ["失效", "培训", "课件", "训课"]:
+        trie.insert(word)
+    path = rule_cache.cache_file_path(cache_dir, CHECKSUM)
+    rule_cache.save_compiled_rules(path, CHECKSUM, trie.compile(), {"失效": "质量"})
+    return path
+
+
+def _array_offset(data: bytes, index: int) -> int:
+    """第 index 个数组在缓存文件中的起始位置（数组元素均为 4 字节）"""
+    lengths = rule_cache._HEADER.unpack_from(data)[4:10]
+    return rule_cache._HEADER_SIZE + 4 * sum(lengths[:index])
+
+
+def test_round_trip(cache_path):
+    assert os.stat(cache_path).st_mode & 0o777 == 0o600
+    trie, keyword_to_primary = rule_cache.load_compiled_rules(cache_path, CHECKSUM)
+    assert trie.search_in_text("培训课件失效") == [(0, "培训"), (1, "训课"), (2, "课件"), (4, "失效")]
+    assert keyword_to_primary == {"失效": "质量"}
+    assert rule_cache.load_compiled_rules(cache_path, "cd" * 32) is None
+
+
+@pytest.mark.parametrize("index, position, value", [
+    (2, 0, 10 ** 6),  # edge_targets 越界
+    (3, 2, 5),  # 失败指针指向编号更大的状态
+    (4, 1, 100),  # word_id 越界
+])
+def test_out_of_range_arrays_are_rejected(cache_path, index, position, value):
+    with open(cache_path, "rb") as f:
+        data = bytearray(f.read())
+    struct.pack_into("I", data, _array_offset(data, index) + 4 * position, value)
+    with open(cache_path, "wb") as f:
+        f.write(data)
+    assert rule_cache.load_compiled_rules(cache_path, CHECKSUM) is None
+
+
+def test_truncated_file_is_rejected(cache_path):
+    with open(cache_path, "rb") as f:
+        data = f.read()
+    with open(cache_path, "wb") as f:
+        f.write(data[:-5])
+    assert rule_cache.load_compiled_rules(cache_path, CHECKSUM) is None
+
+
+def test_files_and_dirs_writable_by_others_are_ignored(cache_path):
+    os.chmod(cache_path, 0o666)
+    assert rule_cache.load_compiled_rules(cache_path, CHECKSUM) is None
+    cache_dir = os.path.dirname(cache_path)
+    os.chmod(cache_dir, 0o777)
+    assert not rule_cache.ensure_private_dir(cache_dir)